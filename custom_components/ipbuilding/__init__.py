@@ -1,14 +1,32 @@
 """The IPBuilding integration."""
 import asyncio
 import logging
+from time import monotonic
 import aiohttp
 
 from homeassistant.config_entries import ConfigEntry
 from homeassistant.const import CONF_HOST, CONF_PORT, Platform
-from homeassistant.core import HomeAssistant
-from homeassistant.helpers.aiohttp_client import async_get_clientsession
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.exceptions import ConfigEntryNotReady
+import homeassistant.helpers.config_validation as cv
 
-from .const import DOMAIN
+from .const import (
+    DOMAIN,
+    TYPE_RELAY, TYPE_DIMMER, TYPE_DMX, TYPE_ENERGY_COUNTER, TYPE_ENERGY_METER,
+    TYPE_BUTTON, TYPE_TEMPERATURE, TYPE_DETECTOR, TYPE_ANALOG_SENSOR,
+    TYPE_KMI, TYPE_WEATHER_STATION, TYPE_TIME, TYPE_LED,
+    TYPE_ACCESS_READER, TYPE_ACCESS_KEY, TYPE_SPHERE, TYPE_TEMP_SPHERE,
+    TYPE_PROG, TYPE_ACCESS_CONTROL, TYPE_SCRIPT, TYPE_REGIME,
+    KIND_LIGHT,
+    CONF_SCAN_INTERVAL_MIN,
+    CONF_SCAN_INTERVAL_MAX,
+    CONF_PUSH_PATH,
+    CONF_STALE_GRACE,
+    CONF_CAPTURE_TRAFFIC,
+    DEFAULT_SCAN_INTERVAL_MIN,
+    DEFAULT_SCAN_INTERVAL_MAX,
+    DEFAULT_STALE_GRACE,
+)
 
 # NOTE: IPBuildingAPI is imported lazily inside async_setup_entry to avoid blocking imports during component loading.
 
@@ -16,138 +34,367 @@ _LOGGER = logging.getLogger(__name__)
 
 PLATFORMS: list[Platform] = [Platform.LIGHT, Platform.SWITCH, Platform.BUTTON, Platform.SENSOR, Platform.SCENE]
 
+# Platforms that only have entities when one of these device types is present
+# (light also covers relays of kind light, sensor is always set up)
+PLATFORM_TYPES: dict[Platform, list[int]] = {
+    Platform.LIGHT: [TYPE_DIMMER],
+    Platform.SWITCH: [TYPE_RELAY],
+    Platform.BUTTON: [TYPE_BUTTON],
+    Platform.SCENE: [TYPE_SPHERE, TYPE_TEMP_SPHERE],
+}
+
+CONFIG_SCHEMA = cv.config_entry_only_config_schema(DOMAIN)
+
+# Define Hubs and their associated types
+# (hub_id, hub_name, list_of_types)
+HUB_DEFINITIONS = [
+    ("hub_dimmers", "IPBuilding Dimmers", [TYPE_DIMMER]),
+    ("hub_relays", "IPBuilding Relays", [TYPE_RELAY]),
+    ("hub_dmx", "IPBuilding DMX", [TYPE_DMX]),
+    ("hub_led", "IPBuilding LED", [TYPE_LED]),
+    ("hub_buttons", "IPBuilding Buttons", [TYPE_BUTTON]),
+    ("hub_scenes", "IPBuilding Scenes", [TYPE_SPHERE, TYPE_TEMP_SPHERE]),
+    ("hub_detectors", "IPBuilding Detectors", [TYPE_DETECTOR]),
+    ("hub_temperature", "IPBuilding Temperature", [TYPE_TEMPERATURE]),
+    ("hub_weather", "IPBuilding Weather", [TYPE_KMI, TYPE_WEATHER_STATION]),
+    ("hub_energy", "IPBuilding Energy", [TYPE_ENERGY_COUNTER, TYPE_ENERGY_METER]),
+    ("hub_access", "IPBuilding Access", [TYPE_ACCESS_READER, TYPE_ACCESS_KEY, TYPE_ACCESS_CONTROL]),
+    ("hub_analog", "IPBuilding Analog", [TYPE_ANALOG_SENSOR]),
+    ("hub_system", "IPBuilding System", [TYPE_TIME, TYPE_REGIME]),
+    ("hub_logic", "IPBuilding Logic", [TYPE_PROG, TYPE_SCRIPT]),
+]
+
+async def async_setup(hass: HomeAssistant, config: dict) -> bool:
+    """Register the integration's services."""
+    from .services import async_setup_services
+
+    async_setup_services(hass)
+    return True
+
 async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     """Set up IPBuilding from a config entry."""
     hass.data.setdefault(DOMAIN, {})
+    started = monotonic()
 
     host = entry.data[CONF_HOST]
     port = entry.data[CONF_PORT]
-    session = async_get_clientsession(hass)
     
     # Lazy import to avoid blocking the event loop during component loading
-    from .api import IPBuildingAPI
-    # Import DataUpdateCoordinator
-    from homeassistant.helpers.update_coordinator import DataUpdateCoordinator, UpdateFailed
-    from datetime import timedelta
-    from .const import TYPE_RELAY, TYPE_DIMMER, TYPE_DMX, TYPE_LED
-
-    api = IPBuildingAPI(host, port, session)
-
-    # Define the polling function
-    async def async_update_data():
-        """Fetch data from API - Only specific types."""
-        try:
-            # Poll only types 1, 2, 3 (DMX), 60 (LED)
-            # DMX is 3, LED is 60 in const.py
-            partial_devices = await api.get_devices([TYPE_RELAY, TYPE_DIMMER, TYPE_DMX, TYPE_LED])
-            
-            # Convert to dict
-            partial_data = {d.get("ID") or d.get("id"): d for d in partial_devices}
-            
-            # Merge with existing data
-            # We access the coordinator's current data via 'coordinator.data' but we are inside the method passed TO it.
-            # We can't access 'coordinator' instance here easily before creation if we define function inline?
-            # Actually, we can use a closure or 'nonlocal' if defined inside setup_entry.
-            # But 'coordinator' variable is created AFTER this function definition usually.
-            # Solution: We can wrap this in a class or use the fact that we return the NEW data.
-            # BUT we need the OLD data to merge.
-            # 'coordinator.data' is available on the coordinator object.
-            # We'll define the function, create coordinator, then attach function? No.
-            # Better: Define a class or use a mutable dict reference.
-            
-            # Actually, standard way:
-            current_data = coordinator.data if coordinator.data else {}
-            # Create a NEW dict to trigger updates? Or update in place?
-            # Creating a shallow copy to be safe and ensure 'data' reference changes if HA checks identity.
-            new_data = current_data.copy()
-            new_data.update(partial_data)
-            return new_data
-
-        except Exception as e:
-            raise UpdateFailed(f"Error communicating with API: {e}")
-
-    # Initialize Coordinator
-    coordinator = DataUpdateCoordinator(
-        hass,
-        _LOGGER,
-        name="ipbuilding_fast",
-        update_method=async_update_data,
-        update_interval=timedelta(seconds=20),
-    )
+    from .api import IPBuildingAPI, ControllerCapabilities
+    from .cache import DiscoveryCache
+    from .coordinator import IPBuildingCoordinator
+    from .devices import async_register_devices
+    from .scheduler import async_register
+    from .store import DeviceStore
 
-    hass.data[DOMAIN][entry.entry_id] = {
-        "api": api,
-        "coordinator": coordinator,
-    }
+    # The API owns a connection pool dedicated to this controller
+    capture_path = None
+    if entry.options.get(CONF_CAPTURE_TRAFFIC):
+        # A new file per setup, so a reload doesn't append to the previous capture
+        from homeassistant.util import dt as dt_util
 
-    # Fetch initial data (ALL devices) for the first run
+        stamp = dt_util.now().strftime("%Y%m%d-%H%M%S")
+        capture_path = hass.config.path(f"ipbuilding_capture_{entry.entry_id}_{stamp}.jsonl.gz")
+        _LOGGER.info("Capturing IPBuilding controller traffic to %s", capture_path)
+    api = IPBuildingAPI(host, port, capture_path=capture_path)
+
+    # Everything after this point may fail: the connection pool, scheduler slot
+    # and coordinator are then released here, as async_unload_entry won't run
+    coordinator = None
     try:
-        all_devices = await api.get_devices()
-        initial_data = {d.get("ID") or d.get("id"): d for d in all_devices}
-        # Seed the coordinator with initial data
-        coordinator.async_set_updated_data(initial_data)
-    except Exception as e:
-        _LOGGER.error("Failed to fetch initial devices: %s", e)
-        return False
-    
-    # Create Hub Devices for Grouping
-    from homeassistant.helpers import device_registry as dr
-    from .const import (
-        TYPE_RELAY, TYPE_DIMMER, TYPE_DMX, TYPE_ENERGY_COUNTER, TYPE_ENERGY_METER,
-        TYPE_BUTTON, TYPE_TEMPERATURE, TYPE_DETECTOR, TYPE_ANALOG_SENSOR,
-        TYPE_KMI, TYPE_WEATHER_STATION, TYPE_TIME, TYPE_LED,
-        TYPE_ACCESS_READER, TYPE_ACCESS_KEY, TYPE_SPHERE, TYPE_TEMP_SPHERE,
-        TYPE_PROG, TYPE_ACCESS_CONTROL, TYPE_SCRIPT, TYPE_REGIME
+        cache = DiscoveryCache(hass, entry.entry_id)
+
+        # Initialize Coordinator (polls types 1, 2, 3 and 60, only notifies changed devices).
+        # Each controller has its own; the scheduler caps concurrent polls across all of them.
+        coordinator = IPBuildingCoordinator(
+            hass,
+            api,
+            scan_interval_min=entry.options.get(CONF_SCAN_INTERVAL_MIN, DEFAULT_SCAN_INTERVAL_MIN),
+            scan_interval_max=entry.options.get(CONF_SCAN_INTERVAL_MAX, DEFAULT_SCAN_INTERVAL_MAX),
+            cache=cache,
+            config_entry=entry,
+            scheduler=async_register(hass, entry.entry_id),
+            stale_grace=entry.options.get(CONF_STALE_GRACE, DEFAULT_STALE_GRACE),
+        )
+
+        # Start from the cached device list when there is one, so entities come up
+        # immediately (even with the controller offline) and reconcile in the background.
+        # Without a cache, fetch ALL devices for the first run.
+        snapshot = await cache.async_load()
+        if snapshot is not None:
+            coordinator.async_set_updated_data(DeviceStore(snapshot.devices))
+        else:
+            try:
+                all_devices = await api.get_devices()
+            except Exception as e:
+                raise ConfigEntryNotReady(f"Failed to fetch initial devices: {e}") from e
+            # Seed the coordinator with initial data
+            coordinator.async_set_updated_data(DeviceStore(all_devices))
+        loaded = monotonic()
+
+        platforms = _platforms_for(coordinator.data)
+        hass.data[DOMAIN][entry.entry_id] = {
+            "api": api,
+            "coordinator": coordinator,
+            "platforms": platforms,
+        }
+
+        # Create Hub Devices for Grouping
+        # (the system hub always exists, it also holds the diagnostic sensors),
+        # then every controller device in one pass: entities only link to them.
+        # On a warm start the cached hubs that are still registered are kept as they are.
+        created_hubs = _async_registered_hubs(hass, entry, snapshot.hubs) if snapshot is not None else []
+        created_hubs.extend(
+            _async_create_hubs(hass, entry, coordinator.data.types | {TYPE_TIME}, created_hubs)
+        )
+        async_register_devices(hass, entry.entry_id, coordinator.data.values())
+        registered = monotonic()
+
+        # Remember what we found for the next restart
+        cache.async_schedule_save(coordinator.data, created_hubs)
+
+        # Devices that appear later get their hub and device before the platforms add
+        # their entities (setting up platforms that had nothing to add so far),
+        # devices that disappear are removed from the registries
+        @callback
+        def async_devices_added(devices) -> None:
+            if new_hubs := _async_create_hubs(hass, entry, {d.type for d in devices}, created_hubs):
+                created_hubs.extend(new_hubs)
+                cache.async_schedule_save(coordinator.data, created_hubs)
+            async_register_devices(hass, entry.entry_id, devices)
+            if new_platforms := [p for p in _platforms_for(coordinator.data) if p not in platforms]:
+                platforms.extend(new_platforms)
+                entry.async_create_background_task(
+                    hass,
+                    hass.config_entries.async_forward_entry_setups(entry, new_platforms),
+                    "ipbuilding_forward_platforms",
+                )
+
+        entry.async_on_unload(coordinator.async_add_device_listener(async_devices_added))
+        entry.async_on_unload(
+            coordinator.async_add_removal_listener(
+                lambda device_ids: _async_remove_devices(hass, entry, device_ids)
+            )
+        )
+
+        # Forward entry setups, only for the platforms that have entities to add
+        await hass.config_entries.async_forward_entry_setups(entry, platforms)
+        forwarded = monotonic()
+
+        # Fast-poll only the types whose entities are enabled, now that they are registered
+        entry.async_on_unload(coordinator.async_track_enabled_entities())
+
+        if snapshot is not None:
+            # Reconcile the cached snapshot with the controller without blocking startup
+            entry.async_create_background_task(
+                hass, _async_reconcile_cache(hass, entry, coordinator), "ipbuilding_reconcile_cache"
+            )
+        else:
+            _async_remove_orphans(hass, entry, coordinator.data)
+
+        # Optional push channel, polling remains the fallback
+        if push_path := entry.options.get(CONF_PUSH_PATH):
+            from .transport import HTTPStreamTransport, PushSupervisor
+
+            supervisor = PushSupervisor(coordinator, HTTPStreamTransport(api, push_path))
+            hass.data[DOMAIN][entry.entry_id]["push"] = supervisor
+            entry.async_create_background_task(hass, supervisor.async_run(), "ipbuilding_push")
+
+        # Request strategy: reuse the probed capabilities of this entry, or probe once
+        if snapshot is not None and snapshot.capabilities is not None:
+            api.capabilities = ControllerCapabilities(**snapshot.capabilities)
+        else:
+            entry.async_create_background_task(
+                hass, _async_probe_capabilities(coordinator), "ipbuilding_probe_capabilities"
+            )
+
+        # Reload when the polling or push options change
+        entry.async_on_unload(entry.add_update_listener(async_reload_entry))
+    except BaseException:
+        hass.data[DOMAIN].pop(entry.entry_id, None)
+        if coordinator is not None:
+            await coordinator.async_shutdown()
+        await api.async_close()
+        _async_release_scheduler(hass, entry.entry_id)
+        raise
+
+    _LOGGER.info(
+        "Set up IPBuilding controller at %s with %d devices in %.2fs "
+        "(%s %.2fs, registries %.2fs, platforms %s %.2fs)",
+        host,
+        len(coordinator.data),
+        monotonic() - started,
+        "cache" if snapshot is not None else "initial fetch",
+        loaded - started,
+        registered - loaded,
+        ", ".join(platforms),
+        forwarded - registered,
     )
-    
-    dev_reg = dr.async_get(hass)
-    
-    # We already have 'all_devices' from the initial fetch above.
-    
-    # Track present types
-    present_types = set()
-    for d in all_devices:
-        if dtype := d.get("Type") or d.get("type"):
-            present_types.add(int(dtype))
-
-    # Define Hubs and their associated types
-    # (hub_id, hub_name, list_of_types)
-    hub_definitions = [
-        ("hub_dimmers", "IPBuilding Dimmers", [TYPE_DIMMER]),
-        ("hub_relays", "IPBuilding Relays", [TYPE_RELAY]),
-        ("hub_dmx", "IPBuilding DMX", [TYPE_DMX]),
-        ("hub_led", "IPBuilding LED", [TYPE_LED]),
-        ("hub_buttons", "IPBuilding Buttons", [TYPE_BUTTON]),
-        ("hub_scenes", "IPBuilding Scenes", [TYPE_SPHERE, TYPE_TEMP_SPHERE]),
-        ("hub_detectors", "IPBuilding Detectors", [TYPE_DETECTOR]),
-        ("hub_temperature", "IPBuilding Temperature", [TYPE_TEMPERATURE]),
-        ("hub_weather", "IPBuilding Weather", [TYPE_KMI, TYPE_WEATHER_STATION]),
-        ("hub_energy", "IPBuilding Energy", [TYPE_ENERGY_COUNTER, TYPE_ENERGY_METER]),
-        ("hub_access", "IPBuilding Access", [TYPE_ACCESS_READER, TYPE_ACCESS_KEY, TYPE_ACCESS_CONTROL]),
-        ("hub_analog", "IPBuilding Analog", [TYPE_ANALOG_SENSOR]),
-        ("hub_system", "IPBuilding System", [TYPE_TIME, TYPE_REGIME]),
-        ("hub_logic", "IPBuilding Logic", [TYPE_PROG, TYPE_SCRIPT]),
+    return True
+
+def _platforms_for(store) -> list[Platform]:
+    """Return the platforms that have entities for the devices in the store."""
+    types = store.types
+    return [
+        platform
+        for platform in PLATFORMS
+        if platform not in PLATFORM_TYPES
+        or any(t in types for t in PLATFORM_TYPES[platform])
+        or (platform == Platform.LIGHT and store.by_type_kind(TYPE_RELAY, KIND_LIGHT))
     ]
-    
-    for hub_id, hub_name, types in hub_definitions:
+
+@callback
+def _async_create_hubs(
+    hass: HomeAssistant, entry: ConfigEntry, present_types: set[int], existing: list[str]
+) -> list[str]:
+    """Create the hub devices for the given device types, return the new hub IDs."""
+    from homeassistant.helpers import device_registry as dr
+    from .devices import scoped_identifier
+
+    dev_reg = dr.async_get(hass)
+    created = []
+    for hub_id, hub_name, types in HUB_DEFINITIONS:
         # Check if any of the types for this hub are present
-        if any(t in present_types for t in types):
+        if hub_id not in existing and any(t in present_types for t in types):
+            created.append(hub_id)
             dev_reg.async_get_or_create(
                 config_entry_id=entry.entry_id,
-                identifiers={(DOMAIN, hub_id)},
+                identifiers={scoped_identifier(entry.entry_id, hub_id)},
                 name=hub_name,
                 manufacturer="IPBuilding",
                 model="System Hub",
             )
+    return created
+
+@callback
+def _async_registered_hubs(hass: HomeAssistant, entry: ConfigEntry, hub_ids: list[str]) -> list[str]:
+    """Return the hub IDs that are still in the device registry."""
+    from homeassistant.helpers import device_registry as dr
+    from .devices import scoped_identifier
+
+    dev_reg = dr.async_get(hass)
+    return [
+        hub_id
+        for hub_id in hub_ids
+        if dev_reg.async_get_device(identifiers={scoped_identifier(entry.entry_id, hub_id)}) is not None
+    ]
+
+@callback
+def _async_remove_devices(hass: HomeAssistant, entry: ConfigEntry, device_ids: set[int]) -> None:
+    """Remove the registry devices (and with them, their entities) of vanished controller devices."""
+    from homeassistant.helpers import device_registry as dr
+    from .devices import DEVICE_IDENTIFIER_PREFIXES, scoped_identifier
+
+    dev_reg = dr.async_get(hass)
+    removed = 0
+    for device_id in device_ids:
+        for prefix in DEVICE_IDENTIFIER_PREFIXES:
+            identifier = scoped_identifier(entry.entry_id, f"{prefix}_{device_id}")
+            if (device := dev_reg.async_get_device(identifiers={identifier})) is not None:
+                dev_reg.async_update_device(device.id, remove_config_entry_id=entry.entry_id)
+                removed += 1
+    if removed:
+        _LOGGER.info("Removed %d IPBuilding devices from the device registry", removed)
+
+@callback
+def _async_remove_orphans(hass: HomeAssistant, entry: ConfigEntry, store) -> None:
+    """Remove registry devices of this entry whose controller device is gone."""
+    from homeassistant.helpers import device_registry as dr
+    from .devices import DEVICE_IDENTIFIER_PREFIXES
 
-    # Forward entry setups
-    await hass.config_entries.async_forward_entry_setups(entry, PLATFORMS)
+    if not store:
+        return
+    prefix = f"{entry.entry_id}_"
+    orphans = set()
+    for device in dr.async_entries_for_config_entry(dr.async_get(hass), entry.entry_id):
+        for domain, key in device.identifiers:
+            if domain != DOMAIN or not key.startswith(prefix):
+                continue
+            kind, _, device_id = key[len(prefix):].rpartition("_")
+            if kind in DEVICE_IDENTIFIER_PREFIXES and device_id.isdigit() and int(device_id) not in store:
+                orphans.add(int(device_id))
+    if orphans:
+        _async_remove_devices(hass, entry, orphans)
 
+async def _async_reconcile_cache(hass: HomeAssistant, entry: ConfigEntry, coordinator) -> None:
+    """Fetch everything after starting from the cache, then drop orphaned registry devices."""
+    await coordinator.async_full_refresh()
+    if coordinator.last_update_success:
+        _async_remove_orphans(hass, entry, coordinator.data)
+
+async def _async_probe_capabilities(coordinator) -> None:
+    """Probe what the controller supports and cache it with the discovery data."""
+    from dataclasses import asdict
+
+    try:
+        capabilities = await coordinator.api.async_probe_capabilities(coordinator.data.type_counts())
+    except Exception as e:
+        _LOGGER.debug("Capability probe failed, keeping client-side filtering: %s", e)
+        return
+    if coordinator.cache is not None:
+        coordinator.cache.async_schedule_save(coordinator.data, capabilities=asdict(capabilities))
+
+async def async_migrate_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
+    """Scope unique IDs and device identifiers of a version 1 entry to the entry."""
+    if entry.version > 2:
+        return False
+    if entry.version == 1:
+        from homeassistant.helpers import device_registry as dr, entity_registry as er
+
+        entry_id = entry.entry_id
+
+        @callback
+        def migrate_unique_id(entity_entry: er.RegistryEntry) -> dict | None:
+            # ipbuilding_dimmer_5 -> <entry_id>_dimmer_5, ipbuilding_<entry_id>_x -> <entry_id>_x
+            if not entity_entry.unique_id.startswith("ipbuilding_"):
+                return None
+            rest = entity_entry.unique_id[len("ipbuilding_"):]
+            if not rest.startswith(f"{entry_id}_"):
+                rest = f"{entry_id}_{rest}"
+            return {"new_unique_id": rest}
+
+        await er.async_migrate_entries(hass, entry_id, migrate_unique_id)
+
+        dev_reg = dr.async_get(hass)
+        for device in dr.async_entries_for_config_entry(dev_reg, entry_id):
+            if len(device.config_entries) > 1:
+                # Shared by colliding entries: leave it to the others, setup creates our own
+                dev_reg.async_update_device(device.id, remove_config_entry_id=entry_id)
+                continue
+            dev_reg.async_update_device(
+                device.id,
+                new_identifiers={
+                    (domain, f"{entry_id}_{key}") if domain == DOMAIN else (domain, key)
+                    for domain, key in device.identifiers
+                },
+            )
+
+        hass.config_entries.async_update_entry(entry, version=2)
+        _LOGGER.debug("Migrated IPBuilding entry %s to version 2", entry_id)
     return True
 
+def _async_release_scheduler(hass: HomeAssistant, entry_id: str) -> None:
+    """Stop using the shared poll scheduler."""
+    from .scheduler import async_unregister
+
+    async_unregister(hass, entry_id)
+
+async def async_reload_entry(hass: HomeAssistant, entry: ConfigEntry) -> None:
+    """Reload the config entry after its options changed."""
+    await hass.config_entries.async_reload(entry.entry_id)
+
 async def async_unload_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     """Unload a config entry."""
-    if unload_ok := await hass.config_entries.async_unload_platforms(entry, PLATFORMS):
-        hass.data[DOMAIN].pop(entry.entry_id)
+    platforms = hass.data[DOMAIN][entry.entry_id]["platforms"]
+    if unload_ok := await hass.config_entries.async_unload_platforms(entry, platforms):
+        data = hass.data[DOMAIN].pop(entry.entry_id)
+        await data["api"].async_close()
+        _async_release_scheduler(hass, entry.entry_id)
 
     return unload_ok
+
+async def async_remove_entry(hass: HomeAssistant, entry: ConfigEntry) -> None:
+    """Remove the discovery cache of a deleted config entry."""
+    from .cache import DiscoveryCache
+
+    await DiscoveryCache(hass, entry.entry_id).async_remove()
@@ -1,66 +1,343 @@
 """API Client for IPBuilding."""
+import asyncio
 import logging
+import time
+from collections.abc import Callable
+from dataclasses import dataclass
+from typing import Any
+
 import aiohttp
 import async_timeout
 
+from .const import (
+    COMMAND_MAX_IN_FLIGHT,
+    COMMAND_MAX_ATTEMPTS,
+    COMMAND_RETRY_BACKOFF,
+    REQUEST_TIMEOUT,
+    STREAM_CHUNK_SIZE,
+    PROJECTION_FIELDS,
+    PUSH_READ_TIMEOUT,
+    CONNECTOR_LIMIT,
+    CONNECTOR_LIMIT_PER_HOST,
+    CONNECTOR_KEEPALIVE,
+    CONNECTOR_DNS_TTL,
+)
+from .breaker import CircuitBreaker, CircuitOpenError
+from .capture import TrafficRecorder
+from .jsonstream import JSONItemStream
+from .metrics import RequestMetrics
+from .models import IPBuildingDevice
+
 _LOGGER = logging.getLogger(__name__)
 
+
+def _is_transient(err: Exception) -> bool:
+    """Return True for errors worth retrying (connection drops, timeouts, 5xx)."""
+    if isinstance(err, aiohttp.ClientResponseError):
+        return err.status >= 500
+    return isinstance(err, (aiohttp.ClientConnectionError, asyncio.TimeoutError))
+
+
+def _not_sent(err: Exception) -> bool:
+    """Return True for errors that mean the request never reached the controller."""
+    return isinstance(err, aiohttp.ClientConnectorError)
+
+
+def _item_type(item: Any) -> int | None:
+    """Return the numeric type of a raw item, without building a record."""
+    if not isinstance(item, dict):
+        return None
+    try:
+        return int(item.get("Type") or item.get("type") or 0)
+    except (TypeError, ValueError):
+        return None
+
+
+@dataclass(slots=True)
+class ControllerCapabilities:
+    """What the controller's comp/items endpoint supports, found by probing."""
+
+    # The controller honors the `types` query parameter
+    server_type_filter: bool = False
+    # The controller honors the `fields` query parameter
+    field_projection: bool = False
+
+
+class _PendingCommand:
+    """Latest command queued for a device, plus everyone waiting on it."""
+
+    __slots__ = ("value", "action_type", "repeatable", "futures")
+
+    def __init__(self, value: int, action_type: str, repeatable: bool, future: asyncio.Future) -> None:
+        self.value = value
+        self.action_type = action_type
+        self.repeatable = repeatable
+        self.futures = [future]
+
+
+def create_session() -> aiohttp.ClientSession:
+    """Create a session with a connection pool sized for a single controller.
+
+    The controller sits on one LAN address, so connections are kept alive
+    between polls and commands and its address is resolved once and cached.
+    """
+    connector = aiohttp.TCPConnector(
+        limit=CONNECTOR_LIMIT,
+        limit_per_host=CONNECTOR_LIMIT_PER_HOST,
+        keepalive_timeout=CONNECTOR_KEEPALIVE,
+        use_dns_cache=True,
+        ttl_dns_cache=CONNECTOR_DNS_TTL,
+        ssl=False,
+    )
+    return aiohttp.ClientSession(
+        connector=connector,
+        timeout=aiohttp.ClientTimeout(total=REQUEST_TIMEOUT),
+    )
+
 class IPBuildingAPI:
-    """IPBuilding API Client."""
+    """IPBuilding API Client.
+
+    Commands sent with set_value go through a small pipeline: pending commands
+    for the same device collapse into the latest one, at most
+    COMMAND_MAX_IN_FLIGHT requests are sent at once, and transient failures are
+    retried with exponential backoff.
+
+    comp/items and action requests go through a circuit breaker: when the
+    controller keeps failing they fail fast with CircuitOpenError instead of
+    each waiting out REQUEST_TIMEOUT, until a probe request succeeds again.
+
+    Without an explicit session the client owns a dedicated connection pool
+    (see create_session), which is closed by async_close.
+
+    With a `capture_path`, every request and its answer is recorded to that
+    file (see TrafficRecorder) until async_close.
+    """
 
-    def __init__(self, host: str, port: int, session: aiohttp.ClientSession) -> None:
+    def __init__(
+        self,
+        host: str,
+        port: int,
+        session: aiohttp.ClientSession | None = None,
+        capture_path: str | None = None,
+    ) -> None:
         """Initialize the API client."""
         self._host = host
         self._port = port
-        self._session = session
+        self._owns_session = session is None
+        self._session = session if session is not None else create_session()
         self._base_url = f"http://{host}:{port}/api/v1"
 
-    async def get_devices(self, types=None):
-        """Get devices, optionally filtered by type."""
-        url = f"{self._base_url}/comp/items"
+        self.breaker = CircuitBreaker(host, _is_transient)
+
+        # Request strategy, see async_probe_capabilities
+        self.capabilities = ControllerCapabilities()
+        # Items downloaded only to be dropped by the client-side type filter
+        self.wasted_items = 0
+        self.wasted_bytes = 0
+        # Latency, size and error metrics of comp/items polls and action requests
+        self.fetch_metrics = RequestMetrics()
+        self.command_metrics = RequestMetrics()
+        # Opt-in record of the controller traffic, for tools/replay_server.py
+        self.recorder = TrafficRecorder(capture_path, host) if capture_path else None
+
+        # Command pipeline
+        self._pending: dict[int, _PendingCommand] = {}
+        self._draining: set[int] = set()
+        self._tasks: set[asyncio.Task] = set()
+        self._semaphore = asyncio.Semaphore(COMMAND_MAX_IN_FLIGHT)
+        self._in_flight = 0
+        self.commands_sent = 0
+        self.commands_coalesced = 0
+        self.commands_retried = 0
+        self.commands_failed = 0
+
+    @property
+    def queue_depth(self) -> int:
+        """Number of devices with a command waiting to be sent."""
+        return len(self._pending)
+
+    @property
+    def command_stats(self) -> dict[str, int]:
+        """Counters of the command pipeline."""
+        return {
+            "queue_depth": self.queue_depth,
+            "in_flight": self._in_flight,
+            "sent": self.commands_sent,
+            "coalesced": self.commands_coalesced,
+            "retried": self.commands_retried,
+            "failed": self.commands_failed,
+        }
+
+    async def get_devices(self, types=None, state_only: bool = False) -> list[IPBuildingDevice]:
+        """Get devices, optionally filtered by type, as normalized records.
+
+        With state_only, and a controller that supports field projection, only
+        the state fields are requested: the records then lack static fields
+        such as Description and Group and must be merged as partial updates.
+        """
         params = {}
         if types is not None:
             if isinstance(types, list):
                 params["types"] = ",".join(str(t) for t in types)
             else:
                 params["types"] = types
+        if state_only and self.capabilities.field_projection:
+            params["fields"] = ",".join(PROJECTION_FIELDS)
+
+        # Client-side filtering, unless the controller is known to filter itself
+        allowed_types = None
+        if types is not None and not self.capabilities.server_type_filter:
+            allowed_types = set(types) if isinstance(types, list) else {int(types)}
+
+        devices: list[IPBuildingDevice] = []
+        received = 0
+
+        def handle_item(item: Any, size: int) -> None:
+            nonlocal received
+            received += 1
+            # Filter on the raw type first, so dropped items are never normalized
+            if allowed_types is not None and _item_type(item) not in allowed_types:
+                self.wasted_items += 1
+                self.wasted_bytes += size
+                return
+            if isinstance(item, dict) and (device := IPBuildingDevice.from_dict(item)) is not None:
+                devices.append(device)
 
+        start = time.monotonic()
         try:
-            async with async_timeout.timeout(10):
-                async with self._session.get(url, params=params) as response:
-                    response.raise_for_status()
-                    data = await response.json()
-                    
-                    # Ensure we have a list
-                    if not isinstance(data, list):
-                        # If the API returns a wrapper, try to extract the list. 
-                        # But based on jq output it seems to be a list.
-                        if isinstance(data, dict) and "items" in data:
-                            data = data["items"]
-                        else:
-                            # If it's a single object or unknown, wrap it
-                            data = [data] if data else []
-
-                    # Client-side filtering to be safe
-                    if types is not None:
-                        filtered = []
-                        allowed_types = set(types) if isinstance(types, list) else {types}
-                        
-                        for d in data:
-                            # Check 'Type' or 'type'
-                            dtype = d.get("Type") or d.get("type")
-                            if dtype is not None and int(dtype) in allowed_types:
-                                filtered.append(d)
-                        return filtered
-                    
-                    return data
+            size = await self._async_fetch_items(params, handle_item)
+        except CircuitOpenError as e:
+            _LOGGER.debug("Not fetching devices: %s", e)
+            raise
         except Exception as e:
+            self.fetch_metrics.record_error(
+                time.monotonic() - start, isinstance(e, asyncio.TimeoutError)
+            )
             _LOGGER.error("Error fetching devices: %s", e)
             raise
+        self.fetch_metrics.record(time.monotonic() - start, size, received)
+        return devices
+
+    async def _async_fetch_items(self, params: dict, handle_item: Callable[[Any, int], None]) -> int:
+        """Fetch comp/items, pass each raw item and its size to handle_item.
+
+        Items are decoded one by one as the payload arrives, so the raw list
+        is never held in memory next to the records built from it. Returns
+        the payload size in bytes.
+        """
+        url = f"{self._base_url}/comp/items"
+        size = 0
+        # The raw payload is only kept while capturing
+        chunks: list[bytes] | None = [] if self.recorder is not None else None
+        status = None
+        start = time.monotonic()
+        try:
+            with self.breaker.guard():
+                async with async_timeout.timeout(REQUEST_TIMEOUT):
+                    async with self._session.get(url, params=params) as response:
+                        status = response.status
+                        response.raise_for_status()
+                        stream = JSONItemStream()
+                        async for chunk in response.content.iter_chunked(STREAM_CHUNK_SIZE):
+                            size += len(chunk)
+                            if chunks is not None:
+                                chunks.append(chunk)
+                            for item, item_size in stream.feed(chunk):
+                                handle_item(item, item_size)
+                        for item, item_size in stream.close():
+                            handle_item(item, item_size)
+        except Exception as err:
+            self._record_failure("comp/items", params, start, status, err)
+            raise
+        if self.recorder is not None:
+            self.recorder.record("comp/items", params, start, status, b"".join(chunks))
+        return size
+
+    def _record_failure(
+        self, path: str, params: dict, start: float, status: int | None, err: Exception
+    ) -> None:
+        """Record a failed request while capturing (not the ones the breaker never sent)."""
+        if self.recorder is not None and not isinstance(err, CircuitOpenError):
+            self.recorder.record(path, params, start, status, error=err)
+
+    async def async_listen_events(
+        self,
+        path: str,
+        on_connected: Callable[[], None],
+        on_items: Callable[[list[Any]], None],
+    ) -> None:
+        """Read change events from a long-lived request until the server ends it.
+
+        Raises if the connection fails or stays silent for PUSH_READ_TIMEOUT.
+        """
+        path = path.lstrip("/")
+        url = f"{self._base_url}/{path}"
+        timeout = aiohttp.ClientTimeout(total=None, sock_read=PUSH_READ_TIMEOUT)
+        recorder = self.recorder
+        async with self._session.get(url, timeout=timeout) as response:
+            if recorder is not None:
+                recorder.record(path, {}, time.monotonic(), response.status)
+            response.raise_for_status()
+            on_connected()
+            stream = JSONItemStream(sequence=True)
+            async for chunk in response.content.iter_any():
+                if recorder is not None:
+                    recorder.record_chunk(path, chunk)
+                if items := stream.feed(chunk):
+                    on_items([item for item, _size in items])
+            if items := stream.close():
+                on_items([item for item, _size in items])
+
+    async def async_probe_capabilities(self, type_counts: dict[int, int]) -> ControllerCapabilities:
+        """Find out whether the controller filters by type and projects fields.
+
+        `type_counts` (devices per type, from a full fetch) picks the rarest
+        type as the probe, so the probe requests are as small as possible.
+        The result is stored in `capabilities` and drives get_devices.
+        """
+        capabilities = ControllerCapabilities()
+        if len(type_counts) < 2:
+            # With a single type present, filtering can't be told apart from ignoring it
+            self.capabilities = capabilities
+            return capabilities
+        probe_type = min(type_counts, key=type_counts.get)
+
+        seen_types: set[int | None] = set()
+        await self._async_fetch_items(
+            {"types": probe_type}, lambda item, size: seen_types.add(_item_type(item))
+        )
+        capabilities.server_type_filter = seen_types == {probe_type}
 
-    async def set_value(self, device_id: int, value: int, action_type: str = None):
+        allowed_keys = set(PROJECTION_FIELDS) | {"__type"}
+        projected: list[bool] = []
+        await self._async_fetch_items(
+            {"types": probe_type, "fields": ",".join(PROJECTION_FIELDS)},
+            lambda item, size: projected.append(isinstance(item, dict) and set(item) <= allowed_keys),
+        )
+        capabilities.field_projection = bool(projected) and all(projected)
+
+        if not capabilities.server_type_filter:
+            _LOGGER.warning(
+                "IPBuilding controller at %s ignores the 'types' filter: every poll "
+                "downloads all items and filters them locally",
+                self._host,
+            )
+        _LOGGER.debug("Controller capabilities for %s: %s", self._host, capabilities)
+        self.capabilities = capabilities
+        return capabilities
+
+    async def set_value(
+        self, device_id: int, value: int, action_type: str = None, repeatable: bool = True
+    ):
         """Set a value for a device using the proper action endpoint.
         For dimmers we use actionType=DIM, for relays ON/OFF.
+
+        The command is queued; if a newer command for the same device arrives
+        before this one is sent, only the newer one is sent and both callers get
+        its result. Commands that must not arrive twice (button and scene
+        presses) pass `repeatable=False`: they are only retried when the
+        connection could not be made, not after a timeout or 5xx, when the
+        controller may already have acted on them.
         """
         # Determine action type based on value if not provided
         if action_type is None:
@@ -69,6 +346,99 @@ class IPBuildingAPI:
             else:
                 action_type = "DIM"
 
+        future = asyncio.get_running_loop().create_future()
+        if (pending := self._pending.get(device_id)) is not None:
+            # Latest value wins
+            pending.value = value
+            pending.action_type = action_type
+            pending.repeatable = repeatable
+            pending.futures.append(future)
+            self.commands_coalesced += 1
+        else:
+            self._pending[device_id] = _PendingCommand(value, action_type, repeatable, future)
+
+        if device_id not in self._draining:
+            self._draining.add(device_id)
+            task = asyncio.create_task(self._async_drain(device_id))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+        return await future
+
+    async def _async_drain(self, device_id: int) -> None:
+        """Send queued commands for one device, one at a time, until none are left."""
+        try:
+            while (command := self._pending.pop(device_id, None)) is not None:
+                try:
+                    async with self._semaphore:
+                        self._in_flight += 1
+                        try:
+                            result = await self._async_send_with_retry(
+                                device_id, command.value, command.action_type, command.repeatable
+                            )
+                        finally:
+                            self._in_flight -= 1
+                except asyncio.CancelledError:
+                    for future in command.futures:
+                        future.cancel()
+                    raise
+                except Exception as err:
+                    for future in command.futures:
+                        if not future.done():
+                            future.set_exception(err)
+                else:
+                    for future in command.futures:
+                        if not future.done():
+                            future.set_result(result)
+        finally:
+            self._draining.discard(device_id)
+
+    async def _async_send_with_retry(
+        self, device_id: int, value: int, action_type: str, repeatable: bool = True
+    ):
+        """Send one command, retrying transient failures with exponential backoff.
+
+        The breaker sees the command once, with the outcome of its last
+        attempt, so one failing command doesn't open it for the controller.
+        """
+        try:
+            with self.breaker.guard():
+                result = await self._async_send_attempts(device_id, value, action_type, repeatable)
+        except CircuitOpenError as err:
+            # Fail fast while the controller is known to be down
+            self.commands_failed += 1
+            _LOGGER.debug("Not setting value for device %s: %s", device_id, err)
+            raise
+        except Exception as err:
+            self.commands_failed += 1
+            _LOGGER.error("Error setting value for device %s: %s", device_id, err)
+            raise
+        self.commands_sent += 1
+        return result
+
+    async def _async_send_attempts(
+        self, device_id: int, value: int, action_type: str, repeatable: bool
+    ):
+        """Send a command up to COMMAND_MAX_ATTEMPTS times, raising the last error."""
+        for attempt in range(COMMAND_MAX_ATTEMPTS):
+            try:
+                return await self._async_send_action(device_id, value, action_type)
+            except Exception as err:
+                if (
+                    attempt + 1 >= COMMAND_MAX_ATTEMPTS
+                    or not _is_transient(err)
+                    or not (repeatable or _not_sent(err))
+                ):
+                    raise
+                self.commands_retried += 1
+                delay = COMMAND_RETRY_BACKOFF * 2 ** attempt
+                _LOGGER.debug(
+                    "Retrying command for device %s in %.1fs after: %s", device_id, delay, err
+                )
+                await asyncio.sleep(delay)
+
+    async def _async_send_action(self, device_id: int, value: int, action_type: str):
+        """Send a single action request to the controller (the caller guards it with the breaker)."""
         # Build URL according to the documented endpoint
         url = f"{self._base_url}/action/action"
         params = {
@@ -76,12 +446,37 @@ class IPBuildingAPI:
             "actionType": action_type,
             "value": value,
         }
+        status = None
+        start = time.monotonic()
         try:
-            async with async_timeout.timeout(10):
+            async with async_timeout.timeout(REQUEST_TIMEOUT):
                 async with self._session.get(url, params=params) as response:
+                    status = response.status
                     response.raise_for_status()
-                    return await response.json(content_type=None)
-        except Exception as e:
-            _LOGGER.error("Error setting value for device %s: %s", device_id, e)
+                    body = await response.read()
+                    result = await response.json(content_type=None)
+        except Exception as err:
+            self.command_metrics.record_error(
+                time.monotonic() - start, isinstance(err, asyncio.TimeoutError)
+            )
+            self._record_failure("action/action", params, start, status, err)
             raise
+        self.command_metrics.record(time.monotonic() - start, len(body))
+        if self.recorder is not None:
+            self.recorder.record("action/action", params, start, status, body)
+        return result
 
+    async def async_close(self) -> None:
+        """Cancel queued commands and close the connection pool if we own it."""
+        for task in list(self._tasks):
+            task.cancel()
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+        for command in self._pending.values():
+            for future in command.futures:
+                future.cancel()
+        self._pending.clear()
+        if self.recorder is not None:
+            await self.recorder.async_close()
+        if self._owns_session and not self._session.closed:
+            await self._session.close()
@@ -0,0 +1,127 @@
+"""Circuit breaker for requests to an IPBuilding controller."""
+from __future__ import annotations
+
+import logging
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager
+from time import monotonic
+
+from .const import BREAKER_FAILURE_THRESHOLD, BREAKER_RESET_MIN, BREAKER_RESET_MAX
+
+_LOGGER = logging.getLogger(__name__)
+
+STATE_CLOSED = "closed"
+STATE_OPEN = "open"
+STATE_HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of sending a request while the breaker is open."""
+
+
+class CircuitBreaker:
+    """Stops sending requests to a controller that keeps failing.
+
+    After BREAKER_FAILURE_THRESHOLD consecutive failures the breaker opens:
+    requests fail immediately with CircuitOpenError instead of each waiting
+    out its timeout. Once the backoff has passed the breaker is half-open and
+    lets a single probe request through. A successful probe closes it, a
+    failed one reopens it with the backoff doubled (up to BREAKER_RESET_MAX).
+
+    `is_failure` decides which errors count: any other error still means the
+    controller answered, so it counts as a success.
+    """
+
+    def __init__(self, name: str, is_failure: Callable[[Exception], bool]) -> None:
+        """Initialize a closed breaker."""
+        self._name = name
+        self._is_failure = is_failure
+        self.state = STATE_CLOSED
+        self.failures = 0
+        self.opened = 0
+        self._backoff = BREAKER_RESET_MIN
+        self._retry_at = 0.0
+        self._probing = False
+        # monotonic() of the last request the controller answered
+        self.last_success: float | None = None
+
+    @property
+    def retry_in(self) -> float:
+        """Seconds until the next probe is let through (0 when closed)."""
+        if self.state == STATE_CLOSED:
+            return 0.0
+        return max(0.0, self._retry_at - monotonic())
+
+    def before_request(self) -> None:
+        """Let a request through, or raise CircuitOpenError."""
+        if self.state == STATE_CLOSED:
+            return
+        if self.state == STATE_OPEN and monotonic() >= self._retry_at:
+            self.state = STATE_HALF_OPEN
+        if self.state == STATE_HALF_OPEN and not self._probing:
+            self._probing = True
+            return
+        raise CircuitOpenError(
+            f"IPBuilding controller at {self._name} is unreachable, "
+            f"next attempt in {self.retry_in:.0f}s"
+        )
+
+    def record_success(self) -> None:
+        """The controller answered."""
+        self.last_success = monotonic()
+        self.failures = 0
+        self._probing = False
+        if self.state != STATE_CLOSED:
+            _LOGGER.info("IPBuilding controller at %s is reachable again", self._name)
+            self.state = STATE_CLOSED
+            self._backoff = BREAKER_RESET_MIN
+
+    def record_failure(self) -> None:
+        """The controller did not answer (connection error, timeout, 5xx)."""
+        self.failures += 1
+        if self.state == STATE_HALF_OPEN:
+            self._probing = False
+            self._backoff = min(self._backoff * 2, BREAKER_RESET_MAX)
+            self._open()
+        elif self.state == STATE_CLOSED and self.failures >= BREAKER_FAILURE_THRESHOLD:
+            _LOGGER.warning(
+                "IPBuilding controller at %s failed %d requests in a row, "
+                "pausing requests for %ss",
+                self._name,
+                self.failures,
+                self._backoff,
+            )
+            self._open()
+
+    def _open(self) -> None:
+        self.state = STATE_OPEN
+        self.opened += 1
+        self._retry_at = monotonic() + self._backoff
+
+    @contextmanager
+    def guard(self) -> Iterator[None]:
+        """Run one request through the breaker and record its outcome."""
+        self.before_request()
+        try:
+            yield
+        except Exception as err:
+            if self._is_failure(err):
+                self.record_failure()
+            else:
+                self.record_success()
+            raise
+        except BaseException:
+            # Cancelled: no outcome, but don't block the next probe
+            self._probing = False
+            raise
+        self.record_success()
+
+    def as_dict(self) -> dict[str, object]:
+        """Return the breaker state for diagnostics."""
+        return {
+            "state": self.state,
+            "consecutive_failures": self.failures,
+            "times_opened": self.opened,
+            "retry_in_s": round(self.retry_in, 1),
+            "backoff_s": self._backoff,
+        }
@@ -1,15 +1,16 @@
 """Button platform for IPBuilding."""
 import logging
-from typing import Any
 
 from homeassistant.components.button import ButtonEntity
 from homeassistant.config_entries import ConfigEntry
-from homeassistant.core import HomeAssistant
+from homeassistant.core import HomeAssistant, callback
 from homeassistant.helpers.entity_platform import AddEntitiesCallback
-from homeassistant.helpers.update_coordinator import CoordinatorEntity, DataUpdateCoordinator
 
 from .const import DOMAIN, TYPE_BUTTON
 from .api import IPBuildingAPI
+from .coordinator import IPBuildingCoordinator
+from .entity import IPBuildingEntity
+from .models import IPBuildingDevice
 
 _LOGGER = logging.getLogger(__name__)
 
@@ -21,84 +22,46 @@ async def async_setup_entry(
     """Set up the IPBuilding button platform."""
     data = hass.data[DOMAIN][entry.entry_id]
     api: IPBuildingAPI = data["api"]
-    coordinator: DataUpdateCoordinator = data["coordinator"]
+    coordinator: IPBuildingCoordinator = data["coordinator"]
 
-    # Initial data is already in coordinator
-    devices = []
-    if coordinator.data:
-        # Filter for Buttons (Type 50)
-        from .const import TYPE_BUTTON
-        for dev_id, device in coordinator.data.items():
-            if int(device.get("Type") or 0) == TYPE_BUTTON:
-                devices.append(device)
+    @callback
+    def async_add_devices(devices: list[IPBuildingDevice]) -> None:
+        """Add Buttons (Type 50)."""
+        async_add_entities(
+            IPBuildingButton(coordinator, api, device)
+            for device in devices
+            if device.type == TYPE_BUTTON
+        )
 
-    entities = []
-    for device in devices:
-        entities.append(IPBuildingButton(coordinator, api, device))
+    # Initial data is already in coordinator's type index, later buttons come from polls
+    async_add_devices(coordinator.data.by_type(TYPE_BUTTON))
+    entry.async_on_unload(coordinator.async_add_device_listener(async_add_devices))
 
-    async_add_entities(entities)
 
-
-class IPBuildingButton(CoordinatorEntity, ButtonEntity):
+class IPBuildingButton(IPBuildingEntity, ButtonEntity):
     """Representation of an IPBuilding Button."""
 
-    _attr_has_entity_name = True
-
-    def __init__(self, coordinator: DataUpdateCoordinator, api: IPBuildingAPI, device: dict) -> None:
+    def __init__(self, coordinator: IPBuildingCoordinator, api: IPBuildingAPI, device: IPBuildingDevice) -> None:
         """Initialize the button."""
-        super().__init__(coordinator)
-        self._api = api
-        self._device_id = device.get("ID") or device.get("id")
-        self._initial_device_data = device
-        
-        self._attr_unique_id = f"ipbuilding_button_{self._device_id}"
-        self._attr_name = device.get("Description") or device.get("name") or f"Button {self._device_id}"
+        super().__init__(coordinator, api, device)
+
+        self._attr_unique_id = self._unique_id("button")
+        self._attr_name = device.description or f"Button {self._device_id}"
         
         # Disabled by default
         self._attr_entity_registry_enabled_default = False
         
         # Hide state display by default
         self._attr_entity_registry_visible_default = False
-        
-        # Device Info
-        self._attr_device_info = {
-            "identifiers": {(DOMAIN, f"button_{self._device_id}")},
-            "name": self._attr_name,
-            "manufacturer": "IPBuilding",
-            "model": "Button",
-            "via_device": (DOMAIN, "hub_buttons"),
-        }
-        if group := device.get("Group"):
-            self._attr_device_info["suggested_area"] = group.get("Name")
-            
-    @property
-    def _device_data(self) -> dict:
-        """Get the latest device data from coordinator."""
-        # Use initial data as fallback, but ideally it's in coordinator
-        return self.coordinator.data.get(self._device_id, self._initial_device_data)
 
-    @property
-    def available(self) -> bool:
-        """Return if entity is available."""
-        # Use Visible property from API, default to True
-        return self._device_data.get("Visible", True)
-            
-    @property
-    def extra_state_attributes(self) -> dict[str, Any]:
-        """Return the state attributes."""
-        d = self._device_data
-        return {
-            "IpAddress": d.get("IpAddress"),
-            "Port": d.get("Port"),
-            "Protocol": d.get("Protocol"),
-            "ID": self._device_id,
-            "Status": d.get("Status"),
-            "Output": d.get("Output"),
-            "Kind": d.get("Kind"),
-        }
+    def _update_attrs(self, d: IPBuildingDevice) -> None:
+        """Compute availability and state attributes."""
+        super()._update_attrs(d)
+        # Buttons are not polled, so only the Visible property matters
+        self._available = d.visible
 
     async def async_press(self) -> None:
         """Handle the button press."""
         # Assumption: Pressing a button sends a '1' or triggers an action.
         # We'll try sending '1'.
-        await self._api.set_value(self._device_id, 1, "ON")
+        await self.coordinator.async_send_command(self._device_id, 1, "ON", optimistic=False)
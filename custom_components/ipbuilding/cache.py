@@ -0,0 +1,104 @@
+"""Persistent discovery cache for IPBuilding."""
+from __future__ import annotations
+
+import logging
+from dataclasses import asdict, dataclass, field
+from typing import Any
+
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.helpers.storage import Store
+
+from .const import DOMAIN
+from .models import IPBuildingDevice
+from .store import DeviceStore
+
+_LOGGER = logging.getLogger(__name__)
+
+STORAGE_VERSION = 1
+SAVE_DELAY = 10
+
+
+@dataclass(slots=True)
+class DiscoverySnapshot:
+    """Last known devices, hubs, group names and capabilities of a controller."""
+
+    devices: list[IPBuildingDevice]
+    hubs: list[str] = field(default_factory=list)
+    groups: dict[int, str] = field(default_factory=dict)
+    capabilities: dict[str, bool] | None = None
+
+
+class DiscoveryCache:
+    """Last known device list of a config entry, persisted in .storage.
+
+    Lets the integration create its entities immediately on restart, and
+    come up even when the controller is offline.
+    """
+
+    def __init__(self, hass: HomeAssistant, entry_id: str) -> None:
+        """Initialize the cache."""
+        self._store: Store[dict[str, Any]] = Store(
+            hass, STORAGE_VERSION, f"{DOMAIN}.{entry_id}.discovery"
+        )
+        self._hubs: list[str] = []
+        self._capabilities: dict[str, bool] | None = None
+
+    async def async_load(self) -> DiscoverySnapshot | None:
+        """Load the cached snapshot, None if there is none or it is unreadable."""
+        data = await self._store.async_load()
+        if not data:
+            return None
+        try:
+            groups = {int(group_id): name for group_id, name in data["groups"].items()}
+            devices = []
+            for item in data["devices"]:
+                present = item.pop("present", None)
+                device = IPBuildingDevice(**item)
+                device.present = frozenset(present) if present is not None else None
+                device.group = groups.get(device.group_id, device.group)
+                devices.append(device)
+        except (KeyError, TypeError, ValueError) as err:
+            _LOGGER.warning("Ignoring unreadable IPBuilding discovery cache: %s", err)
+            return None
+        self._hubs = list(data.get("hubs", []))
+        self._capabilities = data.get("capabilities")
+        return DiscoverySnapshot(devices, self._hubs, groups, self._capabilities)
+
+    @callback
+    def async_schedule_save(
+        self,
+        store: DeviceStore,
+        hubs: list[str] | None = None,
+        capabilities: dict[str, bool] | None = None,
+    ) -> None:
+        """Save the current devices after a short delay."""
+        if hubs is not None:
+            self._hubs = hubs
+        if capabilities is not None:
+            self._capabilities = capabilities
+        self._store.async_delay_save(lambda: self._serialize(store), SAVE_DELAY)
+
+    def _serialize(self, store: DeviceStore) -> dict[str, Any]:
+        """Build the stored form: group names once, devices referring to them by ID."""
+        groups: dict[int, str] = {}
+        devices = []
+        for device in store.values():
+            item = asdict(device)
+            # Which state fields (e.g. Watt) the controller reports for the device
+            if device.present is not None:
+                item["present"] = sorted(device.present)
+            if device.group_id is not None:
+                if device.group:
+                    groups[device.group_id] = device.group
+                del item["group"]
+            devices.append(item)
+        return {
+            "devices": devices,
+            "hubs": self._hubs,
+            "groups": groups,
+            "capabilities": self._capabilities,
+        }
+
+    async def async_remove(self) -> None:
+        """Delete the cache file (config entry removed)."""
+        await self._store.async_remove()
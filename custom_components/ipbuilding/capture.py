@@ -0,0 +1,165 @@
+"""Traffic capture for IPBuilding."""
+from __future__ import annotations
+
+import asyncio
+import gzip
+import json
+import logging
+import time
+from collections.abc import Mapping
+from time import monotonic
+from typing import Any
+
+from .const import (
+    CAPTURE_FLUSH_INTERVAL,
+    CAPTURE_FLUSH_RECORDS,
+    CAPTURE_FORMAT_VERSION,
+    CAPTURE_MAX_BYTES,
+)
+
+_LOGGER = logging.getLogger(__name__)
+
+
+def _text(body: bytes) -> str:
+    """Return a body as text that encodes back to the exact same bytes."""
+    return body.decode("utf-8", "surrogateescape")
+
+
+class TrafficRecorder:
+    """Writes the requests to a controller and its answers to a gzip JSON Lines file.
+
+    The first line is a header ({"capture": version, "host", "started"}),
+    then one line per request, in the order they finished:
+
+        {"t": 12.5, "path": "comp/items", "params": {"types": "1,2"},
+         "elapsed": 0.031, "status": 200, "body": "[...]"}
+
+    `t` is when the request was sent, in seconds since the capture started.
+    Failed requests have an "error" (the exception class) instead of, or
+    next to, the status and body. Chunks of the push stream are lines of
+    their own, {"t", "path", "chunk"}, timed when they arrived.
+
+    Lines are buffered and appended by an executor job every
+    CAPTURE_FLUSH_INTERVAL seconds or CAPTURE_FLUSH_RECORDS lines, so the
+    event loop never touches the file. Recording stops once `max_bytes` of
+    bodies were captured. tools/replay_server.py serves a capture back.
+    """
+
+    def __init__(self, path: str, host: str, max_bytes: int = CAPTURE_MAX_BYTES) -> None:
+        """Start a capture; the file is created on the first flush."""
+        self.path = path
+        self._max_bytes = max_bytes
+        self._started = monotonic()
+        self._buffer: list[str] = [
+            json.dumps({"capture": CAPTURE_FORMAT_VERSION, "host": host, "started": time.time()})
+        ]
+        self._file: Any = None
+        self._flush_handle: asyncio.TimerHandle | None = None
+        self._writer: asyncio.Task | None = None
+        self.closed = False
+        self.records = 0
+        self.bytes = 0
+        self.dropped = 0
+
+    def record(
+        self,
+        path: str,
+        params: Mapping[str, Any],
+        started: float,
+        status: int | None = None,
+        body: bytes | None = None,
+        error: Exception | None = None,
+    ) -> None:
+        """Add one request, sent at monotonic() `started`."""
+        entry: dict[str, Any] = {"t": round(started - self._started, 4), "path": path}
+        if params:
+            entry["params"] = {key: str(value) for key, value in params.items()}
+        entry["elapsed"] = round(monotonic() - started, 4)
+        if status is not None:
+            entry["status"] = status
+        if error is not None:
+            entry["error"] = type(error).__name__
+        if body is not None:
+            entry["body"] = _text(body)
+        self._append(entry, len(body) if body is not None else 0)
+
+    def record_chunk(self, path: str, chunk: bytes) -> None:
+        """Add one chunk of a streamed response, as it arrived."""
+        self._append(
+            {"t": round(monotonic() - self._started, 4), "path": path, "chunk": _text(chunk)},
+            len(chunk),
+        )
+
+    def _append(self, entry: dict[str, Any], size: int) -> None:
+        if self.closed:
+            return
+        if self.bytes + size > self._max_bytes:
+            if not self.dropped:
+                _LOGGER.warning(
+                    "IPBuilding traffic capture %s reached %d MB, no longer recording",
+                    self.path,
+                    self._max_bytes // (1024 * 1024),
+                )
+            self.dropped += 1
+            return
+        self.bytes += size
+        self.records += 1
+        self._buffer.append(json.dumps(entry, separators=(",", ":")))
+        if len(self._buffer) >= CAPTURE_FLUSH_RECORDS:
+            self._flush()
+        elif self._flush_handle is None:
+            self._flush_handle = asyncio.get_running_loop().call_later(
+                CAPTURE_FLUSH_INTERVAL, self._flush
+            )
+
+    def _flush(self) -> None:
+        """Start writing the buffer, unless a write is running (it picks the buffer up)."""
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        if self._writer is None and self._buffer:
+            self._writer = asyncio.create_task(self._async_write())
+
+    async def _async_write(self) -> None:
+        loop = asyncio.get_running_loop()
+        try:
+            while self._buffer:
+                lines, self._buffer = self._buffer, []
+                await loop.run_in_executor(None, self._write, lines)
+        except OSError as err:
+            _LOGGER.error("Stopping IPBuilding traffic capture to %s: %s", self.path, err)
+            self.closed = True
+            self._buffer.clear()
+        finally:
+            self._writer = None
+
+    def _write(self, lines: list[str]) -> None:
+        """Append lines to the file (runs in the executor)."""
+        if self._file is None:
+            self._file = gzip.open(self.path, "wt", encoding="utf-8", compresslevel=6)
+        self._file.write("\n".join(lines) + "\n")
+
+    async def async_close(self) -> None:
+        """Write what is buffered and close the file."""
+        if self.closed and self._file is None:
+            return
+        self.closed = True
+        self._flush()
+        if self._writer is not None:
+            await self._writer
+        if self._file is not None:
+            await asyncio.get_running_loop().run_in_executor(None, self._file.close)
+            self._file = None
+        _LOGGER.info(
+            "IPBuilding traffic capture %s closed with %d records", self.path, self.records
+        )
+
+    def as_dict(self) -> dict[str, Any]:
+        """Return the capture state for diagnostics."""
+        return {
+            "path": self.path,
+            "recording": not self.closed and not self.dropped,
+            "records": self.records,
+            "body_bytes": self.bytes,
+            "dropped": self.dropped,
+        }
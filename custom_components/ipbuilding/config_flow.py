@@ -4,17 +4,29 @@ import voluptuous as vol
 
 from homeassistant import config_entries
 from homeassistant.const import CONF_HOST, CONF_PORT
-from homeassistant.core import HomeAssistant
+from homeassistant.core import HomeAssistant, callback
 from homeassistant.data_entry_flow import FlowResult
 
-from .const import DOMAIN, DEFAULT_PORT
+from .const import (
+    DOMAIN,
+    DEFAULT_PORT,
+    CONF_SCAN_INTERVAL_MIN,
+    CONF_SCAN_INTERVAL_MAX,
+    CONF_PUSH_PATH,
+    CONF_STALE_GRACE,
+    CONF_CAPTURE_TRAFFIC,
+    DEFAULT_SCAN_INTERVAL_MIN,
+    DEFAULT_SCAN_INTERVAL_MAX,
+    DEFAULT_STALE_GRACE,
+)
 
 _LOGGER = logging.getLogger(__name__)
 
 class IPBuildingConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
     """Handle a config flow for IPBuilding."""
 
-    VERSION = 1
+    # 2: unique IDs and device identifiers scoped to the config entry
+    VERSION = 2
 
     async def async_step_user(self, user_input=None) -> FlowResult:
         """Handle the initial step."""
@@ -33,3 +45,55 @@ class IPBuildingConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
             ),
             errors=errors,
         )
+
+    @staticmethod
+    @callback
+    def async_get_options_flow(config_entry: config_entries.ConfigEntry) -> config_entries.OptionsFlow:
+        """Get the options flow for this handler."""
+        return IPBuildingOptionsFlow()
+
+
+class IPBuildingOptionsFlow(config_entries.OptionsFlow):
+    """Handle IPBuilding options (polling bounds, stale grace, push channel, capture)."""
+
+    async def async_step_init(self, user_input=None) -> FlowResult:
+        """Manage the polling bounds, the stale grace window and the optional push channel."""
+        errors = {}
+        if user_input is not None:
+            if user_input[CONF_SCAN_INTERVAL_MIN] > user_input[CONF_SCAN_INTERVAL_MAX]:
+                errors["base"] = "invalid_scan_interval"
+            else:
+                return self.async_create_entry(title="", data=user_input)
+
+        options = self.config_entry.options
+        return self.async_show_form(
+            step_id="init",
+            data_schema=vol.Schema(
+                {
+                    vol.Required(
+                        CONF_SCAN_INTERVAL_MIN,
+                        default=options.get(CONF_SCAN_INTERVAL_MIN, DEFAULT_SCAN_INTERVAL_MIN),
+                    ): vol.All(vol.Coerce(int), vol.Range(min=1, max=3600)),
+                    vol.Required(
+                        CONF_SCAN_INTERVAL_MAX,
+                        default=options.get(CONF_SCAN_INTERVAL_MAX, DEFAULT_SCAN_INTERVAL_MAX),
+                    ): vol.All(vol.Coerce(int), vol.Range(min=1, max=3600)),
+                    # Seconds to keep showing the last known state while polls fail, 0 to disable
+                    vol.Required(
+                        CONF_STALE_GRACE,
+                        default=options.get(CONF_STALE_GRACE, DEFAULT_STALE_GRACE),
+                    ): vol.All(vol.Coerce(int), vol.Range(min=0, max=3600)),
+                    # Path under /api/v1 of a long-lived change stream, empty to only poll
+                    vol.Optional(
+                        CONF_PUSH_PATH,
+                        default=options.get(CONF_PUSH_PATH, ""),
+                    ): str,
+                    # Record requests and answers to a file in the config directory
+                    vol.Optional(
+                        CONF_CAPTURE_TRAFFIC,
+                        default=options.get(CONF_CAPTURE_TRAFFIC, False),
+                    ): bool,
+                }
+            ),
+            errors=errors,
+        )
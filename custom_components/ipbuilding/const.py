@@ -38,3 +38,72 @@ KIND_FAN = 5
 KIND_VALVE = 6
 KIND_TEMPERATURE = 7
 KIND_NOT_APPLICABLE = 8
+
+# Polling
+CONF_SCAN_INTERVAL_MIN = "scan_interval_min"
+CONF_SCAN_INTERVAL_MAX = "scan_interval_max"
+DEFAULT_SCAN_INTERVAL_MIN = 5
+DEFAULT_SCAN_INTERVAL_MAX = 20
+SCAN_INTERVAL_DECAY = 1.5
+SCAN_INTERVAL_JITTER = 0.1
+
+# Delay before the targeted refresh that confirms a command (seconds)
+COMMAND_REFRESH_DELAY = 0.3
+
+# Dimmer transitions: steps per second across all fades of a controller, and
+# the shortest time between two steps of one fade (seconds)
+RAMP_MAX_COMMANDS_PER_SECOND = 20
+RAMP_STEP_INTERVAL = 0.1
+
+# Delay before the fast-poll types are rebuilt after entities are enabled or disabled (seconds)
+POLL_TYPES_REBUILD_DELAY = 1.0
+
+# Command pipeline
+COMMAND_MAX_IN_FLIGHT = 4
+COMMAND_MAX_ATTEMPTS = 3
+COMMAND_RETRY_BACKOFF = 0.5
+REQUEST_TIMEOUT = 10
+
+# HTTP connection pool for the controller
+CONNECTOR_LIMIT = 8
+CONNECTOR_LIMIT_PER_HOST = 6
+CONNECTOR_KEEPALIVE = 60
+CONNECTOR_DNS_TTL = 300
+
+# Full fetch of every device type, on top of the fast polls (seconds)
+FULL_SWEEP_INTERVAL = 600
+
+# Device changes kept in the store's change log
+STORE_CHANGELOG_SIZE = 4096
+
+# Read size when streaming comp/items responses (bytes)
+STREAM_CHUNK_SIZE = 65536
+
+# Fields requested for state-only polls when the controller supports projection
+PROJECTION_FIELDS = ("ID", "Type", "Status", "Value", "Visible", "Watt")
+
+# Push channel
+CONF_PUSH_PATH = "push_path"
+PUSH_READ_TIMEOUT = 300
+PUSH_RECONNECT_MIN = 1
+PUSH_RECONNECT_MAX = 60
+
+# Polls shared by all config entries (one per controller)
+DATA_SCHEDULER = f"{DOMAIN}_scheduler"
+POLL_MAX_CONCURRENT = 4
+
+# Circuit breaker around controller requests
+BREAKER_FAILURE_THRESHOLD = 3
+BREAKER_RESET_MIN = 5
+BREAKER_RESET_MAX = 60
+
+# Keep serving the last known state this long after polls start failing (seconds)
+CONF_STALE_GRACE = "stale_grace"
+DEFAULT_STALE_GRACE = 120
+
+# Opt-in capture of controller traffic to a gzip JSON Lines file
+CONF_CAPTURE_TRAFFIC = "capture_traffic"
+CAPTURE_FORMAT_VERSION = 1
+CAPTURE_FLUSH_INTERVAL = 5
+CAPTURE_FLUSH_RECORDS = 200
+CAPTURE_MAX_BYTES = 200 * 1024 * 1024
@@ -0,0 +1,607 @@
+"""Data update coordinator for IPBuilding."""
+from __future__ import annotations
+
+import asyncio
+import logging
+import random
+from contextlib import nullcontext
+from datetime import timedelta
+from time import monotonic
+from collections.abc import Callable, Iterable
+from typing import Any
+
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.core import Event, HomeAssistant, callback
+from homeassistant.exceptions import HomeAssistantError
+from homeassistant.helpers import entity_registry as er
+from homeassistant.helpers.debounce import Debouncer
+from homeassistant.helpers.event import async_call_later
+from homeassistant.helpers.update_coordinator import DataUpdateCoordinator, UpdateFailed
+
+from .api import IPBuildingAPI
+from .breaker import CircuitOpenError
+from .cache import DiscoveryCache
+from .metrics import LatencyHistogram
+from .models import IPBuildingDevice
+from .ramp import RampEngine
+from .scheduler import PollScheduler
+from .store import DeviceStore, MergeResult
+from .const import (
+    TYPE_RELAY, TYPE_DIMMER, TYPE_DMX, TYPE_LED,
+    TYPE_BUTTON, TYPE_SPHERE, TYPE_TEMP_SPHERE,
+    DEFAULT_SCAN_INTERVAL_MIN, DEFAULT_SCAN_INTERVAL_MAX,
+    SCAN_INTERVAL_DECAY, SCAN_INTERVAL_JITTER, COMMAND_REFRESH_DELAY,
+    FULL_SWEEP_INTERVAL, DEFAULT_STALE_GRACE, POLL_TYPES_REBUILD_DELAY,
+)
+
+_LOGGER = logging.getLogger(__name__)
+
+# Types polled on every fast refresh (DMX is 3, LED is 60). Scenes are
+# included so their availability (Visible) follows within one interval.
+FAST_POLL_TYPES = [TYPE_RELAY, TYPE_DIMMER, TYPE_DMX, TYPE_LED, TYPE_SPHERE, TYPE_TEMP_SPHERE]
+
+# Types whose command is a press: sending it twice presses twice
+PRESS_TYPES = (TYPE_BUTTON, TYPE_SPHERE, TYPE_TEMP_SPHERE)
+
+
+
+class AdaptiveInterval:
+    """Poll interval that tightens on activity and decays toward an idle ceiling."""
+
+    def __init__(
+        self,
+        minimum: float,
+        maximum: float,
+        decay: float = SCAN_INTERVAL_DECAY,
+        jitter: float = SCAN_INTERVAL_JITTER,
+    ) -> None:
+        """Initialize the interval, starting at the fastest rate."""
+        self.minimum = minimum
+        self.maximum = max(minimum, maximum)
+        self._decay = decay
+        self._jitter = jitter
+        self.current = self.minimum
+
+    def activity(self) -> None:
+        """Something changed: poll at the fastest rate."""
+        self.current = self.minimum
+
+    def idle(self) -> None:
+        """Nothing changed: back off toward the ceiling."""
+        self.current = min(self.current * self._decay, self.maximum)
+
+    def next_interval(self) -> timedelta:
+        """Return the next interval with jitter, so installs don't poll in lockstep.
+
+        The jitter never takes the interval past the idle ceiling.
+        """
+        spread = self.current * self._jitter
+        seconds = self.current + random.uniform(-spread, spread)
+        return timedelta(seconds=min(self.maximum, max(self.minimum, seconds)))
+
+
+class IPBuildingCoordinator(DataUpdateCoordinator[DeviceStore]):
+    """Coordinator that only notifies entities whose device actually changed.
+
+    The data is a DeviceStore that polls merge into in place. Entities
+    subscribe with their device ID as listener context. After a refresh only
+    listeners whose context is in the changed set are called. Listeners
+    without a context, and any refresh that flips the success state, still get
+    a full fan-out.
+
+    Every FULL_SWEEP_INTERVAL one poll fetches every type instead, so devices
+    that are not fast-polled (time, regime, buttons, sensors) stay current.
+    Of the FAST_POLL_TYPES, only those with an enabled entity are fast-polled
+    (see async_track_enabled_entities); the others only get the full sweeps.
+
+    The poll interval adapts: it drops to the minimum after changes or commands
+    and decays back toward the maximum while the installation is idle. While a
+    push channel is connected (see transport.py) it stays at the maximum.
+
+    With several controllers, each has its own coordinator: a slow or failing
+    building only affects its own entities. Polls take a slot of the shared
+    PollScheduler, which caps how many controllers are polled at once.
+
+    When polls fail, entities keep serving the last known state, marked stale,
+    until `stale_grace` seconds after the controller last answered. Only then
+    do they become unavailable.
+
+    Commands go through async_send_command: the value is written optimistically,
+    rolled back if the command fails, and confirmed by a debounced refresh of
+    only the affected device types. Dimmer transitions run in `ramps` and are
+    cancelled by any newer command to the same device.
+    """
+
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        api: IPBuildingAPI,
+        scan_interval_min: float = DEFAULT_SCAN_INTERVAL_MIN,
+        scan_interval_max: float = DEFAULT_SCAN_INTERVAL_MAX,
+        cache: DiscoveryCache | None = None,
+        config_entry: ConfigEntry | None = None,
+        scheduler: PollScheduler | None = None,
+        stale_grace: float = DEFAULT_STALE_GRACE,
+    ) -> None:
+        """Initialize the coordinator."""
+        self.interval = AdaptiveInterval(scan_interval_min, scan_interval_max)
+        entry_id = config_entry.entry_id if config_entry is not None else ""
+        super().__init__(
+            hass,
+            _LOGGER,
+            config_entry=config_entry,
+            name=f"ipbuilding_fast_{entry_id}" if entry_id else "ipbuilding_fast",
+            update_interval=self.interval.next_interval(),
+        )
+        self.api = api
+        self.cache = cache
+        self.entry_id = entry_id
+        self.scheduler = scheduler
+        self.data = DeviceStore()
+        # None means "notify everyone" (initial data, errors, manual updates)
+        self._changed_ids: set | None = None
+        self._notified_success: bool | None = None
+        self.last_changed_count = 0
+        self.last_unchanged_count = 0
+        # Time spent merging polls into the store, and listeners called per refresh
+        self.merge_latency = LatencyHistogram()
+        self.last_notified_count = 0
+        self.notified_total = 0
+        self._last_full_sweep: float | None = None
+        self.push_active = False
+        self.stale_grace = stale_grace
+        self._stale_expired = False
+        self._stale_unsub: Callable[[], None] | None = None
+        # device_id -> (status, value, level) before the optimistic write, until confirmed
+        self._optimistic: dict[int, tuple[Any, Any, int]] = {}
+        self._pending_types: set[int] = set()
+        # Fast-poll types that back an enabled entity
+        self.poll_types: list[int] = list(FAST_POLL_TYPES)
+        # Entity IDs of this entry, to recognise their removal
+        self._entity_ids: set[str] = set()
+        self._registry_unsub: Callable[[], None] | None = None
+        self._poll_types_rebuild = Debouncer(
+            hass,
+            _LOGGER,
+            cooldown=POLL_TYPES_REBUILD_DELAY,
+            immediate=False,
+            function=self._async_rebuild_poll_types,
+        )
+        # Called with devices that appear, and IDs that disappear, after setup
+        self._device_listeners: list[Callable[[list[IPBuildingDevice]], None]] = []
+        self._removal_listeners: list[Callable[[set[int]], None]] = []
+        self.ramps = RampEngine(self)
+        self._command_refresh = Debouncer(
+            hass,
+            _LOGGER,
+            cooldown=COMMAND_REFRESH_DELAY,
+            immediate=False,
+            function=self._async_refresh_pending_types,
+        )
+
+    async def _async_update_data(self) -> DeviceStore:
+        """Fetch the fast-poll types (or everything, on a sweep) and merge them into the store."""
+        full_sweep = (
+            self._last_full_sweep is None
+            or monotonic() - self._last_full_sweep >= FULL_SWEEP_INTERVAL
+        )
+        if not full_sweep and not self.poll_types:
+            if self.last_update_success:
+                # Every fast-poll entity is disabled, nothing to fetch until the next sweep
+                self._changed_ids = set()
+                self.interval.idle()
+                self.update_interval = self.interval.next_interval()
+                return self.data
+            # Let a full fetch find out whether the controller is back
+            full_sweep = True
+        types = None if full_sweep else self.poll_types
+        slot = self.scheduler.slot() if self.scheduler is not None else nullcontext()
+        try:
+            async with slot:
+                partial_devices = await self.api.get_devices(types, state_only=not full_sweep)
+        except Exception as e:
+            self._changed_ids = None
+            self.interval.idle()
+            # While the breaker is open, the next poll is its probe
+            self.update_interval = max(
+                self.interval.next_interval(), timedelta(seconds=self.api.breaker.retry_in)
+            )
+            self._schedule_stale_expiry()
+            if isinstance(e, CircuitOpenError):
+                raise UpdateFailed(str(e)) from e
+            raise UpdateFailed(f"Error communicating with API: {e}") from e
+
+        self._cancel_stale_expiry()
+        self._stale_expired = False
+
+        merge_start = monotonic()
+        result = self.data.merge(
+            partial_devices, types, partial=not full_sweep and self.api.capabilities.field_projection
+        )
+        self.merge_latency.observe(monotonic() - merge_start)
+        if full_sweep:
+            self._last_full_sweep = monotonic()
+            if self.cache is not None:
+                self.cache.async_schedule_save(self.data)
+        changed = result.changed | result.removed
+        self._async_topology_changed(result)
+
+        self.last_changed_count = len(changed)
+        self.last_unchanged_count = result.unchanged
+        self._changed_ids = changed
+        self._confirm_optimistic(partial_devices)
+
+        if self.push_active:
+            # Changes arrive over the push channel, polling is only a safety net
+            self.interval.current = self.interval.maximum
+        elif changed:
+            self.interval.activity()
+        else:
+            self.interval.idle()
+        # Picked up by _schedule_refresh once this update returns
+        self.update_interval = self.interval.next_interval()
+
+        _LOGGER.debug(
+            "%s: %d devices changed, %d unchanged, next poll in %.1fs",
+            "Full sweep" if full_sweep else "Refresh",
+            self.last_changed_count,
+            self.last_unchanged_count,
+            self.update_interval.total_seconds(),
+        )
+        return self.data
+
+    @callback
+    def async_add_device_listener(
+        self, on_added: Callable[[list[IPBuildingDevice]], None]
+    ) -> Callable[[], None]:
+        """Call on_added with the devices a poll finds that weren't known before."""
+        self._device_listeners.append(on_added)
+        return lambda: self._device_listeners.remove(on_added)
+
+    @callback
+    def async_add_removal_listener(self, on_removed: Callable[[set[int]], None]) -> Callable[[], None]:
+        """Call on_removed with the IDs of devices the controller no longer reports."""
+        self._removal_listeners.append(on_removed)
+        return lambda: self._removal_listeners.remove(on_removed)
+
+    @callback
+    def _async_topology_changed(self, result: MergeResult) -> None:
+        """Pass added and removed devices of a merge to the listeners, in one batch each."""
+        if (result.added or result.removed) and self._registry_unsub is not None:
+            self._poll_types_rebuild.async_schedule_call()
+        if result.added:
+            added = [self.data[device_id] for device_id in result.added]
+            _LOGGER.info("%d new IPBuilding devices found", len(added))
+            for on_added in list(self._device_listeners):
+                on_added(added)
+        if result.removed:
+            _LOGGER.info("%d IPBuilding devices no longer reported", len(result.removed))
+            for on_removed in list(self._removal_listeners):
+                on_removed(result.removed)
+
+    @callback
+    def async_track_enabled_entities(self) -> Callable[[], None]:
+        """Build the fast-poll types from the entity registry and keep them current.
+
+        Rebuilt (debounced) when entities of this entry are created, removed,
+        enabled or disabled. Returns the function that stops tracking.
+        """
+        ent_reg = er.async_get(self.hass)
+
+        @callback
+        def _is_relevant(event_data: er.EventEntityRegistryUpdatedData) -> bool:
+            if event_data["action"] == "remove":
+                # The entry is already gone, so its config entry is unknown
+                return event_data["entity_id"] in self._entity_ids
+            if event_data["action"] == "update" and "disabled_by" not in event_data["changes"]:
+                return False
+            entry = ent_reg.async_get(event_data["entity_id"])
+            return entry is not None and entry.config_entry_id == self.entry_id
+
+        @callback
+        def _async_registry_updated(_event: Event) -> None:
+            self._poll_types_rebuild.async_schedule_call()
+
+        self._async_rebuild_poll_types()
+        self._registry_unsub = self.hass.bus.async_listen(
+            er.EVENT_ENTITY_REGISTRY_UPDATED, _async_registry_updated, event_filter=_is_relevant
+        )
+
+        @callback
+        def _stop() -> None:
+            if self._registry_unsub is not None:
+                self._registry_unsub()
+                self._registry_unsub = None
+            self._poll_types_rebuild.async_cancel()
+
+        return _stop
+
+    @callback
+    def _async_rebuild_poll_types(self) -> None:
+        """Fast-poll only the types with at least one enabled entity.
+
+        Devices without entities (DMX, LED) and devices whose entities are
+        all disabled are left to the full sweeps. The controller's comp/items
+        only filters by type, not by ID, so a single enabled relay still means
+        every relay is fetched.
+        """
+        ent_reg = er.async_get(self.hass)
+        prefix = f"{self.entry_id}_"
+        enabled: set[int] = set()
+        entries = er.async_entries_for_config_entry(ent_reg, self.entry_id)
+        self._entity_ids = {entry.entity_id for entry in entries}
+        for entry in entries:
+            if entry.disabled_by is not None or not entry.unique_id.startswith(prefix):
+                continue
+            # Device entities end in the controller device ID, diagnostic sensors don't
+            device_id = entry.unique_id.rpartition("_")[2]
+            if device_id.isdigit():
+                enabled.add(int(device_id))
+
+        types = sorted({d.type for d in self.data.by_type(*FAST_POLL_TYPES) if d.id in enabled})
+        if types != self.poll_types:
+            _LOGGER.debug("Fast-polling types %s (was %s)", types, self.poll_types)
+            self.poll_types = types
+
+    def _grace_left(self) -> float:
+        """Seconds the last known state may still be served while polls fail."""
+        last_success = self.api.breaker.last_success
+        if self._stale_expired or last_success is None:
+            return 0.0
+        return max(0.0, self.stale_grace - (monotonic() - last_success))
+
+    @property
+    def stale(self) -> bool:
+        """Polls are failing, entities show the last known state."""
+        return not self.last_update_success and self._grace_left() > 0
+
+    @property
+    def data_available(self) -> bool:
+        """Return True while the device data can be shown (fresh or within the grace window)."""
+        return self.last_update_success or self._grace_left() > 0
+
+    @callback
+    def _schedule_stale_expiry(self) -> None:
+        """Notify every entity when the grace window ends.
+
+        The base coordinator only notifies listeners when the success state
+        flips, not on further failed polls, so the end of the grace window
+        needs its own timer.
+        """
+        if self._stale_unsub is not None or (remaining := self._grace_left()) <= 0:
+            return
+        self._stale_unsub = async_call_later(self.hass, remaining, self._async_stale_expired)
+
+    @callback
+    def _cancel_stale_expiry(self) -> None:
+        if self._stale_unsub is not None:
+            self._stale_unsub()
+            self._stale_unsub = None
+
+    @callback
+    def _async_stale_expired(self, _now: Any) -> None:
+        """The grace window ended: entities become unavailable if polls still fail."""
+        self._stale_unsub = None
+        if self.last_update_success:
+            return
+        self._stale_expired = True
+        self._changed_ids = None
+        self.async_update_listeners()
+
+    def _confirm_optimistic(self, devices: list[IPBuildingDevice]) -> None:
+        """Drop optimistic bookkeeping for devices the controller just reported."""
+        if self._optimistic:
+            for d in devices:
+                self._optimistic.pop(d.id, None)
+
+    async def async_send_command(
+        self,
+        device_id: int,
+        value: int,
+        action_type: str | None = None,
+        optimistic: bool = True,
+        ramp_step: bool = False,
+    ) -> None:
+        """Send a command, applying it optimistically and confirming it afterwards.
+
+        A new command cancels a running transition of the device. The steps
+        of the transition itself pass `ramp_step` and are confirmed together
+        once it ends.
+        """
+        if not ramp_step:
+            self.ramps.cancel(device_id)
+        device = self.data.get(device_id)
+        if optimistic and device is not None:
+            self._optimistic.setdefault(device_id, (device.status, device.value, device.level))
+            device.set_level(value)
+            self.data.mark_changed((device_id,))
+            self.async_update_device_listeners({device_id})
+
+        try:
+            await self.api.set_value(
+                device_id,
+                value,
+                action_type,
+                repeatable=device is None or device.type not in PRESS_TYPES,
+            )
+        except Exception as err:
+            self._async_rollback(device_id)
+            raise HomeAssistantError(
+                f"Failed to send {action_type} to IPBuilding device {device_id}: {err}"
+            ) from err
+
+        self.async_note_activity()
+        if optimistic and not ramp_step:
+            await self.async_confirm_commands((device_id,))
+
+    async def async_confirm_commands(self, device_ids: Iterable[int]) -> None:
+        """Schedule the debounced refresh of the types of devices that were sent commands."""
+        self._pending_types.update(
+            self.data[device_id].type for device_id in device_ids if device_id in self.data
+        )
+        if self._pending_types:
+            await self._command_refresh.async_call()
+
+    async def async_send_many(
+        self, commands: dict[int, tuple[int, str | None]]
+    ) -> dict[int, Exception | None]:
+        """Send commands to many devices at once, returning the error per device (None on success).
+
+        All values are applied optimistically in one pass with a single
+        listener notification, the commands share the API's command pipeline,
+        failed devices are rolled back together and one targeted refresh
+        confirms the rest.
+        """
+        applied: set[int] = set()
+        for device_id, (value, _action_type) in commands.items():
+            self.ramps.cancel(device_id)
+            if (device := self.data.get(device_id)) is None:
+                continue
+            self._optimistic.setdefault(device_id, (device.status, device.value, device.level))
+            device.set_level(value)
+            applied.add(device_id)
+        if applied:
+            self.data.mark_changed(applied)
+            self.async_update_device_listeners(applied)
+
+        device_ids = list(commands)
+        outcomes = await asyncio.gather(
+            *(self.api.set_value(device_id, *commands[device_id]) for device_id in device_ids),
+            return_exceptions=True,
+        )
+        results: dict[int, Exception | None] = {}
+        for device_id, outcome in zip(device_ids, outcomes):
+            results[device_id] = outcome if isinstance(outcome, Exception) else None
+        failed = [device_id for device_id, error in results.items() if error is not None]
+        self._async_rollback(*failed)
+
+        if len(failed) < len(device_ids):
+            self.async_note_activity()
+            await self.async_confirm_commands(
+                device_id for device_id in applied if results[device_id] is None
+            )
+        return results
+
+    @callback
+    def _async_rollback(self, *device_ids: int) -> None:
+        """Restore the values devices had before a failed optimistic write."""
+        restored = set()
+        for device_id in device_ids:
+            previous = self._optimistic.pop(device_id, None)
+            if previous is None or device_id not in self.data:
+                continue
+            device = self.data[device_id]
+            device.status, device.value, device.level = previous
+            restored.add(device_id)
+        if restored:
+            self.data.mark_changed(restored)
+            self.async_update_device_listeners(restored)
+
+    async def _async_refresh_pending_types(self) -> None:
+        """Fetch only the device types touched by recent commands and reconcile."""
+        types = sorted(self._pending_types)
+        self._pending_types.clear()
+        if not types:
+            return
+        try:
+            devices = await self.api.get_devices(types, state_only=True)
+        except Exception as err:
+            # Leave the optimistic values in place, the next poll will reconcile
+            _LOGGER.debug("Post-command refresh of types %s failed: %s", types, err)
+            return
+
+        result = self.data.merge(devices, types, partial=self.api.capabilities.field_projection)
+        changed = result.changed | result.removed
+        self._async_topology_changed(result)
+        self._confirm_optimistic(devices)
+        _LOGGER.debug(
+            "Post-command refresh of types %s: %d of %d devices changed",
+            types,
+            len(changed),
+            len(devices),
+        )
+        if changed:
+            self.async_update_device_listeners(changed)
+
+    async def async_shutdown(self) -> None:
+        """Cancel the pending post-command refresh and shut down."""
+        self.ramps.cancel_all()
+        self._command_refresh.async_cancel()
+        self._poll_types_rebuild.async_cancel()
+        self._cancel_stale_expiry()
+        await super().async_shutdown()
+
+    @callback
+    def async_apply_push(self, devices: list[IPBuildingDevice]) -> None:
+        """Apply changed items received over the push channel."""
+        # Push items may carry only state fields; removals are left to the polls
+        result = self.data.merge(devices, (), partial=True)
+        self._confirm_optimistic(devices)
+        if result.changed:
+            self.async_update_device_listeners(result.changed)
+
+    @callback
+    def async_set_push_active(self, active: bool) -> None:
+        """Switch between push mode and polling fallback."""
+        if active == self.push_active:
+            return
+        self.push_active = active
+        if active:
+            _LOGGER.info("IPBuilding push channel connected, polling only as a safety net")
+            return
+        # Catch up on anything missed while the channel was down
+        self.async_note_activity()
+
+    async def async_full_refresh(self) -> None:
+        """Fetch every device type now, e.g. to reconcile a cached snapshot."""
+        self._last_full_sweep = None
+        await self.async_refresh()
+
+    @callback
+    def async_note_activity(self) -> None:
+        """Tighten the poll interval after a command and reschedule the next poll."""
+        if self.push_active:
+            return
+        self.interval.activity()
+        self.update_interval = self.interval.next_interval()
+        if self._listeners:
+            self._schedule_refresh()
+
+    @callback
+    def async_set_updated_data(self, data: DeviceStore) -> None:
+        """Replace the data with a full snapshot and notify every listener."""
+        self._changed_ids = None
+        self._last_full_sweep = monotonic()
+        super().async_set_updated_data(data)
+
+    @callback
+    def async_update_device_listeners(self, device_ids: set) -> None:
+        """Notify only the listeners subscribed to the given device IDs."""
+        for update_callback, context in list(self._listeners.values()):
+            if context in device_ids:
+                update_callback()
+
+    @callback
+    def async_update_listeners(self) -> None:
+        """Update listeners, restricted to changed devices when possible."""
+        changed = self._changed_ids
+        self._changed_ids = None
+        success_flipped = self._notified_success != self.last_update_success
+        self._notified_success = self.last_update_success
+
+        if changed is None or success_flipped or not self.last_update_success:
+            self._count_notified(len(self._listeners))
+            super().async_update_listeners()
+            return
+
+        notified = 0
+        for update_callback, context in list(self._listeners.values()):
+            if context is None or context in changed:
+                update_callback()
+                notified += 1
+        self._count_notified(notified)
+
+    def _count_notified(self, count: int) -> None:
+        """Record how many listeners a refresh notified."""
+        self.last_notified_count = count
+        self.notified_total += count
@@ -0,0 +1,102 @@
+"""Device registry layout for IPBuilding."""
+from __future__ import annotations
+
+from collections.abc import Iterable
+
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.helpers import area_registry as ar, device_registry as dr
+from homeassistant.helpers.device_registry import DeviceInfo
+
+from .const import (
+    DOMAIN,
+    TYPE_BUTTON,
+    TYPE_DIMMER,
+    TYPE_REGIME,
+    TYPE_RELAY,
+    TYPE_SPHERE,
+    TYPE_TEMP_SPHERE,
+    TYPE_TIME,
+)
+from .models import IPBuildingDevice
+
+# Device registry identifier prefixes of controller devices (hubs use hub_<name>)
+DEVICE_IDENTIFIER_PREFIXES = ("output", "button", "scene", "sensor")
+
+# Device type -> (identifier prefix, model, hub) of the devices that get entities
+DEVICE_LAYOUT: dict[int, tuple[str, str, str]] = {
+    TYPE_DIMMER: ("output", "Dimmer", "hub_dimmers"),
+    TYPE_RELAY: ("output", "Relay", "hub_relays"),
+    TYPE_BUTTON: ("button", "Button", "hub_buttons"),
+    TYPE_SPHERE: ("scene", "Scene", "hub_scenes"),
+    TYPE_TEMP_SPHERE: ("scene", "Scene", "hub_scenes"),
+    TYPE_TIME: ("sensor", "Time", "hub_system"),
+    TYPE_REGIME: ("sensor", "Regime", "hub_system"),
+}
+
+
+def scoped_identifier(entry_id: str, key: str) -> tuple[str, str]:
+    """Return the device registry identifier of a hub or device of one config entry.
+
+    Device IDs and hub names are only unique within one controller, so every
+    identifier carries the entry ID.
+    """
+    return (DOMAIN, f"{entry_id}_{key}")
+
+
+def device_identifier(entry_id: str, device: IPBuildingDevice) -> tuple[str, str] | None:
+    """Return the registry identifier of a controller device, None if it has no device."""
+    if (layout := DEVICE_LAYOUT.get(device.type)) is None:
+        return None
+    return scoped_identifier(entry_id, f"{layout[0]}_{device.id}")
+
+
+def device_info(entry_id: str, device: IPBuildingDevice) -> DeviceInfo | None:
+    """Return the full registry entry of a controller device, None if it has no device."""
+    if (layout := DEVICE_LAYOUT.get(device.type)) is None:
+        return None
+    prefix, model, hub = layout
+    return DeviceInfo(
+        identifiers={scoped_identifier(entry_id, f"{prefix}_{device.id}")},
+        name=device.description or f"{model} {device.id}",
+        manufacturer="IPBuilding",
+        model=model,
+        via_device=scoped_identifier(entry_id, hub),
+    )
+
+
+@callback
+def async_register_devices(
+    hass: HomeAssistant, entry_id: str, devices: Iterable[IPBuildingDevice]
+) -> int:
+    """Create or update the registry devices of controller devices in one pass.
+
+    Entities only link to these devices by identifier, so each device is
+    written once however many entities it has. Devices that are registered
+    with the same name and model are skipped, and each group resolves to its
+    area once. A new device is placed in the area of its group; existing
+    devices keep the area the user gave them. Returns the number of devices
+    created.
+    """
+    dev_reg = dr.async_get(hass)
+    area_reg = ar.async_get(hass)
+    areas: dict[str, str] = {}
+    created = 0
+    for device in devices:
+        if (info := device_info(entry_id, device)) is None:
+            continue
+        existing = dev_reg.async_get_device(identifiers=info["identifiers"])
+        if (
+            existing is not None
+            and entry_id in existing.config_entries
+            and existing.name == info["name"]
+            and existing.model == info["model"]
+        ):
+            continue
+        entry = dev_reg.async_get_or_create(config_entry_id=entry_id, **info)
+        if existing is None:
+            created += 1
+            if device.group:
+                if (area_id := areas.get(device.group)) is None:
+                    area_id = areas[device.group] = area_reg.async_get_or_create(device.group).id
+                dev_reg.async_update_device(entry.id, area_id=area_id)
+    return created
@@ -0,0 +1,77 @@
+"""Diagnostics support for IPBuilding."""
+from __future__ import annotations
+
+from dataclasses import asdict
+from typing import Any
+
+from homeassistant.components.diagnostics import async_redact_data
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.const import CONF_HOST
+from homeassistant.core import HomeAssistant
+
+from .const import DOMAIN
+
+TO_REDACT = {CONF_HOST}
+
+
+async def async_get_config_entry_diagnostics(
+    hass: HomeAssistant, entry: ConfigEntry
+) -> dict[str, Any]:
+    """Return diagnostics for a config entry: request, refresh and command metrics."""
+    data = hass.data[DOMAIN][entry.entry_id]
+    api = data["api"]
+    coordinator = data["coordinator"]
+    push = data.get("push")
+
+    return {
+        "entry": {
+            "data": async_redact_data(dict(entry.data), TO_REDACT),
+            "options": dict(entry.options),
+        },
+        "capabilities": asdict(api.capabilities),
+        "devices": {
+            "total": len(coordinator.data),
+            "by_type": coordinator.data.type_counts(),
+        },
+        "polling": {
+            "last_update_success": coordinator.last_update_success,
+            "interval_s": coordinator.interval.current,
+            "push_active": coordinator.push_active,
+            "poll_types": coordinator.poll_types,
+            "stale": coordinator.stale,
+            "last_changed": coordinator.last_changed_count,
+            "last_unchanged": coordinator.last_unchanged_count,
+            "wasted_items": api.wasted_items,
+            "wasted_bytes": api.wasted_bytes,
+        },
+        "store": coordinator.data.changelog_stats(),
+        "breaker": api.breaker.as_dict(),
+        "fetch": api.fetch_metrics.as_dict(),
+        "merge": coordinator.merge_latency.as_dict(),
+        "notify": {
+            "last": coordinator.last_notified_count,
+            "total": coordinator.notified_total,
+            "listeners": len(coordinator._listeners),
+        },
+        "commands": {
+            **api.command_stats,
+            "requests": api.command_metrics.as_dict(),
+        },
+        "transitions": coordinator.ramps.as_dict(),
+        "capture": api.recorder.as_dict() if api.recorder is not None else None,
+        "scheduler": (
+            {
+                "limit": coordinator.scheduler.limit,
+                "active": coordinator.scheduler.active,
+                "entries": len(coordinator.scheduler.entries),
+                "wait": coordinator.scheduler.wait_latency.as_dict(),
+            }
+            if coordinator.scheduler is not None
+            else None
+        ),
+        "push": (
+            {"events_received": push.events_received, "reconnects": push.reconnects}
+            if push is not None
+            else None
+        ),
+    }
@@ -0,0 +1,126 @@
+"""Base entity for IPBuilding."""
+from __future__ import annotations
+
+from typing import Any
+
+from homeassistant.core import callback
+from homeassistant.helpers.device_registry import DeviceInfo
+from homeassistant.helpers.update_coordinator import CoordinatorEntity
+
+from .api import IPBuildingAPI
+from .coordinator import IPBuildingCoordinator
+from .devices import device_identifier
+from .models import IPBuildingDevice
+
+
+class IPBuildingEntity(CoordinatorEntity[IPBuildingCoordinator]):
+    """Base class for entities backed by a single IPBuilding device record.
+
+    Home Assistant reads the state properties several times per state write,
+    so the derived state is computed once per coordinator update in
+    `_update_attrs` and the properties return the stored values. These are
+    plain attributes rather than `_attr_*`, whose setters invalidate Home
+    Assistant's cached properties on every assignment.
+    """
+
+    _attr_has_entity_name = True
+    # Static controller metadata: shown as attributes, but not stored by the
+    # recorder with every state change
+    _unrecorded_attributes = frozenset({"IpAddress", "Port", "Protocol", "ID", "Output", "Kind"})
+
+    def __init__(self, coordinator: IPBuildingCoordinator, api: IPBuildingAPI, device: IPBuildingDevice) -> None:
+        """Subscribe to updates for this device only."""
+        super().__init__(coordinator, context=device.id)
+        self._api = api
+        self._entry_id = coordinator.entry_id
+        self._device_id = device.id
+        self._initial_device = device
+        # The device itself is registered in one batch by async_register_devices
+        self._attr_device_info = DeviceInfo(identifiers={device_identifier(self._entry_id, device)})
+        self._written_key: tuple | None = None
+        self._available = True
+        self._attributes: dict[str, Any] | None = None
+
+    def _unique_id(self, key: str) -> str:
+        """Return a unique ID for this entity, scoped to the config entry."""
+        return f"{self._entry_id}_{key}_{self._device_id}"
+
+    @property
+    def _device(self) -> IPBuildingDevice:
+        """Get the latest device record from the coordinator."""
+        return self.coordinator.data.get(self._device_id, self._initial_device)
+
+    @property
+    def available(self) -> bool:
+        """Return if entity is available, as computed in _update_attrs."""
+        return self._available
+
+    @property
+    def extra_state_attributes(self) -> dict[str, Any] | None:
+        """Return the state attributes, as computed in _update_attrs."""
+        return self._attributes
+
+    async def async_added_to_hass(self) -> None:
+        """Compute the initial state before the first write."""
+        d = self._device
+        self._written_key = self._state_key(d)
+        self._update_attrs(d)
+        await super().async_added_to_hass()
+
+    @callback
+    def _handle_coordinator_update(self) -> None:
+        """Compute the derived state once and write it, if any of its inputs changed.
+
+        Full fan-outs (outages, recovery, the end of the grace window) reach
+        every entity; those whose device record and availability are
+        unchanged skip the state write.
+        """
+        d = self._device
+        if (key := self._state_key(d)) == self._written_key:
+            return
+        self._written_key = key
+        self._update_attrs(d)
+        super()._handle_coordinator_update()
+
+    def _state_key(self, d: IPBuildingDevice) -> tuple:
+        """Return every input of the derived state."""
+        return (
+            self.coordinator.data_available,
+            self.coordinator.stale,
+            d.visible,
+            d.status,
+            d.value,
+            d.watt,
+            d.ip_address,
+            d.port,
+            d.protocol,
+            d.output,
+            d.kind,
+        )
+
+    def _update_attrs(self, d: IPBuildingDevice) -> None:
+        """Compute availability and state attributes; platforms add their state."""
+        # Use Visible property from API, default to True.
+        # Within the stale grace window the last known state is still shown.
+        self._available = self.coordinator.data_available and d.visible
+        self._attributes = self._state_attributes(d)
+
+    def _state_attributes(self, d: IPBuildingDevice) -> dict[str, Any] | None:
+        """Return the state attributes."""
+        attributes = self._build_attributes(d)
+        if self.coordinator.stale:
+            # Last known state, the controller is not answering
+            attributes["stale"] = True
+        return attributes
+
+    def _build_attributes(self, d: IPBuildingDevice) -> dict[str, Any]:
+        """Build the state attributes of a device record."""
+        return {
+            "IpAddress": d.ip_address,
+            "Port": d.port,
+            "Protocol": d.protocol,
+            "ID": self._device_id,
+            "Status": d.status,
+            "Output": d.output,
+            "Kind": d.kind,
+        }
@@ -0,0 +1,114 @@
+"""Incremental parsing of large JSON arrays from the controller."""
+from __future__ import annotations
+
+import codecs
+import json
+from typing import Any
+
+_WHITESPACE = " \t\n\r"
+# What may follow a complete scalar item
+_DELIMITERS = _WHITESPACE + ",]"
+
+
+class JSONItemStream:
+    """Parse the items of a top-level JSON array as the bytes arrive.
+
+    Feed response chunks with feed(); each call returns the items completed by
+    that chunk, together with their size in characters (bytes, for the ASCII
+    payloads the controller sends). Only one partial item is
+    buffered at a time, so peak memory is one chunk plus one item rather than
+    the whole payload and its decoded list.
+
+    Payloads that are not a top-level array (a wrapper object or a single
+    item) are buffered and decoded in one go by close(), unless `sequence`
+    is set: then the payload is a stream of concatenated or newline-delimited
+    items (NDJSON), as sent by a push channel.
+    """
+
+    def __init__(self, sequence: bool = False) -> None:
+        """Initialize the parser."""
+        self._sequence = sequence
+        self._decoder = json.JSONDecoder()
+        self._text_decoder = codecs.getincrementaldecoder("utf-8")()
+        self._buffer = ""
+        # None until the first non-whitespace character tells us the payload shape
+        self._is_array: bool | None = None
+        self._done = False
+
+    def feed(self, chunk: bytes) -> list[tuple[Any, int]]:
+        """Add a chunk and return the (item, size) pairs it completed."""
+        self._buffer += self._text_decoder.decode(chunk)
+        if self._is_array is None:
+            stripped = self._buffer.lstrip(_WHITESPACE)
+            if not stripped:
+                self._buffer = ""
+                return []
+            self._is_array = stripped[0] == "[" or self._sequence
+            self._buffer = stripped[1:] if stripped[0] == "[" else stripped
+        if not self._is_array or self._done:
+            return []
+        return self._drain()
+
+    def close(self) -> list[tuple[Any, int]]:
+        """Finish parsing and return any remaining items."""
+        self._buffer += self._text_decoder.decode(b"", final=True)
+        if not self._is_array:
+            return self._decode_other(self._buffer.strip())
+        items = self._drain(final=True)
+        if not self._done and (not self._sequence or self._buffer.strip()):
+            raise ValueError("Truncated JSON array in controller response")
+        return items
+
+    def _drain(self, final: bool = False) -> list[tuple[Any, int]]:
+        """Decode every complete item in the buffer.
+
+        Objects, arrays and strings end with their own closing character, but
+        a number (or literal) cut by the chunk boundary may continue in the
+        next chunk: it is only decoded once a delimiter follows, or when
+        `final`.
+        """
+        buffer = self._buffer
+        items = []
+        pos = 0
+        end = len(buffer)
+        while True:
+            while pos < end and (buffer[pos] in _WHITESPACE or buffer[pos] == ","):
+                pos += 1
+            if pos >= end:
+                break
+            if buffer[pos] == "]":
+                self._done = True
+                pos = end
+                break
+            try:
+                item, next_pos = self._decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                # Incomplete item, wait for the next chunk
+                break
+            if (
+                not final
+                and not isinstance(item, (dict, list, str))
+                and (next_pos >= end or buffer[next_pos] not in _DELIMITERS)
+            ):
+                # Scalar that may continue in the next chunk ("12" of "1234", "-5" of "-5.5")
+                break
+            items.append((item, next_pos - pos))
+            pos = next_pos
+        self._buffer = buffer[pos:]
+        return items
+
+    @staticmethod
+    def _decode_other(text: str) -> list[tuple[Any, int]]:
+        """Decode a non-array payload: an {"items": [...]} wrapper or a single item."""
+        if not text:
+            return []
+        data = json.loads(text)
+        if isinstance(data, dict) and "items" in data:
+            data = data["items"]
+        elif not data:
+            return []
+        else:
+            data = [data]
+        # Sizes are not known per item here, spread the payload evenly
+        size = len(text) // max(len(data), 1)
+        return [(item, size) for item in data]
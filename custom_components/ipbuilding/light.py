@@ -2,15 +2,22 @@
 import logging
 from typing import Any
 
-from homeassistant.components.light import LightEntity, ColorMode, ATTR_BRIGHTNESS
+from homeassistant.components.light import (
+    ATTR_BRIGHTNESS,
+    ATTR_TRANSITION,
+    ColorMode,
+    LightEntity,
+    LightEntityFeature,
+)
 from homeassistant.config_entries import ConfigEntry
-from homeassistant.core import HomeAssistant
+from homeassistant.core import HomeAssistant, callback
 from homeassistant.helpers.entity_platform import AddEntitiesCallback
-from homeassistant.helpers.update_coordinator import CoordinatorEntity, DataUpdateCoordinator
 
-
-from .const import DOMAIN, TYPE_DIMMER, TYPE_RELAY
+from .const import DOMAIN, TYPE_DIMMER, TYPE_RELAY, KIND_LIGHT
 from .api import IPBuildingAPI
+from .coordinator import IPBuildingCoordinator
+from .entity import IPBuildingEntity
+from .models import IPBuildingDevice
 
 _LOGGER = logging.getLogger(__name__)
 
@@ -22,144 +29,103 @@ async def async_setup_entry(
     """Set up the IPBuilding light platform."""
     data = hass.data[DOMAIN][entry.entry_id]
     api: IPBuildingAPI = data["api"]
-    coordinator: DataUpdateCoordinator = data["coordinator"]
-
-    # from .const import TYPE_RELAY (moved to top)
-    
-    entities = []
-    
-    # We iterate coordinator data because we already fetched everything.
-    # But we need to separate Dimmers and Relays (that are lights).
-    
-    if coordinator.data:
-        for dev_id, device in coordinator.data.items():
-            dtype = int(device.get("Type") or 0)
-            if dtype == TYPE_DIMMER:
-                 entities.append(IPBuildingLight(coordinator, api, device))
-            elif dtype == TYPE_RELAY:
-                 # Check Kind (1 = Light)
-                 if device.get("Kind") == 1:
-                     entities.append(IPBuildingLight(coordinator, api, device))
-
-    async_add_entities(entities)
-
-
-class IPBuildingLight(CoordinatorEntity, LightEntity):
+    coordinator: IPBuildingCoordinator = data["coordinator"]
+
+    @callback
+    def async_add_devices(devices: list[IPBuildingDevice]) -> None:
+        """Add lights for Dimmers and Relays with Kind 1 (Light)."""
+        async_add_entities(
+            IPBuildingLight(coordinator, api, device)
+            for device in devices
+            if device.type == TYPE_DIMMER or (device.type == TYPE_RELAY and device.kind == KIND_LIGHT)
+        )
+
+    # Straight from the coordinator's type index, then whatever appears later
+    store = coordinator.data
+    async_add_devices(store.by_type(TYPE_DIMMER) + store.by_type_kind(TYPE_RELAY, KIND_LIGHT))
+    entry.async_on_unload(coordinator.async_add_device_listener(async_add_devices))
+
+
+class IPBuildingLight(IPBuildingEntity, LightEntity):
     """Representation of an IPBuilding Light (Dimmer)."""
 
-    _attr_has_entity_name = True
     # _attr_color_mode and _attr_supported_color_modes are set in __init__
 
-    def __init__(self, coordinator: DataUpdateCoordinator, api: IPBuildingAPI, device: dict) -> None:
+    def __init__(self, coordinator: IPBuildingCoordinator, api: IPBuildingAPI, device: IPBuildingDevice) -> None:
         """Initialize the light."""
-        super().__init__(coordinator)
-        self._api = api
-        self._device_id = device.get("ID") or device.get("id")
-        self._initial_device_data = device
-        
-        self._attr_unique_id = f"ipbuilding_dimmer_{self._device_id}"
-        self._attr_name = device.get("Description") or device.get("name") or f"Dimmer {self._device_id}"
-        
+        super().__init__(coordinator, api, device)
+        self._is_on = False
+        self._brightness: int | None = None
+
+        self._attr_unique_id = self._unique_id("dimmer")
+        self._attr_name = device.description or f"Dimmer {self._device_id}"
+
         # Determine color mode
-        if device.get("Type") == TYPE_DIMMER:
+        if device.type == TYPE_DIMMER:
             self._attr_color_mode = ColorMode.BRIGHTNESS
             self._attr_supported_color_modes = {ColorMode.BRIGHTNESS}
+            # Transitions are run by the coordinator's ramp engine
+            self._attr_supported_features = LightEntityFeature.TRANSITION
         else:
             self._attr_color_mode = ColorMode.ONOFF
             self._attr_supported_color_modes = {ColorMode.ONOFF}
-            
-        # Device Info setup...
-        hub = "hub_dimmers" if device.get("Type") == TYPE_DIMMER else "hub_relays"
-        self._attr_device_info = {
-            "identifiers": {(DOMAIN, f"output_{self._device_id}")},
-            "name": self._attr_name,
-            "manufacturer": "IPBuilding",
-            "model": "Dimmer" if device.get("Type") == TYPE_DIMMER else "Relay",
-            "via_device": (DOMAIN, hub),
-        }
-        if group := device.get("Group"):
-            self._attr_device_info["suggested_area"] = group.get("Name")
 
-    @property
-    def _device_data(self) -> dict:
-        """Get the latest device data from coordinator."""
-        return self.coordinator.data.get(self._device_id, self._initial_device_data)
-        
-    @property
-    def available(self) -> bool:
-        """Return if entity is available."""
-        return self.coordinator.last_update_success and self._device_data.get("Visible", True)
-
-    @property
-    def extra_state_attributes(self) -> dict[str, Any]:
-        """Return the state attributes."""
-        d = self._device_data
+    def _build_attributes(self, d: IPBuildingDevice) -> dict[str, Any]:
+        """Build the state attributes, leaving out empty values."""
         attrs = {
             "ID": self._device_id,
-            "Kind": d.get("Kind"),
+            "Kind": d.kind,
         }
-        for key in ["IpAddress", "Port", "Protocol", "Status", "Output"]:
-            if val := d.get(key):
+        for key, val in (
+            ("IpAddress", d.ip_address),
+            ("Port", d.port),
+            ("Protocol", d.protocol),
+            ("Status", d.status),
+            ("Output", d.output),
+        ):
+            if val:
                 attrs[key] = val
         return attrs
 
     # No async_update needed, CoordinatorEntity handles it.
-    
+
+    def _update_attrs(self, d: IPBuildingDevice) -> None:
+        """Compute on/off and the brightness between 0..255."""
+        super()._update_attrs(d)
+        self._is_on = d.is_on
+        if self._attr_color_mode != ColorMode.ONOFF:
+            # Dimmer value is typically 0-100 in IPBuilding
+            self._brightness = int(d.level * 255 / 100)
+
     @property
     def is_on(self) -> bool:
         """Return true if light is on."""
-        d = self._device_data
-        val = d.get("Status") or d.get("status") or d.get("Value") or d.get("value")
-        if isinstance(val, bool):
-            return val
-        return int(val or 0) > 0
+        return self._is_on
 
     @property
     def brightness(self) -> int | None:
         """Return the brightness of this light between 0..255."""
-        if self._attr_color_mode == ColorMode.ONOFF:
-            return None
-            
-        d = self._device_data
-        val = d.get("Status") or d.get("status") or d.get("Value") or d.get("value")
-        
-        # If boolean, map to 0/255
-        if isinstance(val, bool):
-             return 255 if val else 0
-             
-        int_val = int(val or 0)
-        # Dimmer value is typically 0-100 in IPBuilding
-        return int(int_val * 255 / 100)
-    
+        return self._brightness
+
     async def async_turn_on(self, **kwargs: Any) -> None:
         """Turn the light on."""
-        d = self._device_data
-        if d.get("Type") == TYPE_DIMMER: # Dimmer
+        if self._device.type == TYPE_DIMMER: # Dimmer
             brightness = kwargs.get(ATTR_BRIGHTNESS, 255)
             val = int(brightness * 100 / 255)
             if val == 0 and brightness > 0:
                 val = 1
-            
-            # Optimistic update: immediately update local state
-            self.coordinator.data[self._device_id]["Value"] = val
-            self.coordinator.data[self._device_id]["Status"] = val
-            self.async_write_ha_state()
-            
-            await self._api.set_value(self._device_id, val, "DIM")
+
+            if transition := kwargs.get(ATTR_TRANSITION):
+                await self.coordinator.ramps.async_ramp(self._device_id, val, transition)
+                return
+            # Optimistic update, rolled back if the command fails
+            await self.coordinator.async_send_command(self._device_id, val, "DIM")
         else:
-            # Optimistic update: immediately update local state
-            self.coordinator.data[self._device_id]["Value"] = 1
-            self.coordinator.data[self._device_id]["Status"] = 1
-            self.async_write_ha_state()
-            
-            await self._api.set_value(self._device_id, 1, "ON")
+            await self.coordinator.async_send_command(self._device_id, 1, "ON")
 
     async def async_turn_off(self, **kwargs: Any) -> None:
         """Turn the light off."""
-        # Optimistic update: immediately update local state
-        self.coordinator.data[self._device_id]["Value"] = 0
-        self.coordinator.data[self._device_id]["Status"] = 0
-        self.async_write_ha_state()
-        
-        await self._api.set_value(self._device_id, 0, "OFF")
-
+        if self._device.type == TYPE_DIMMER and (transition := kwargs.get(ATTR_TRANSITION)):
+            await self.coordinator.ramps.async_ramp(self._device_id, 0, transition)
+            return
+        await self.coordinator.async_send_command(self._device_id, 0, "OFF")
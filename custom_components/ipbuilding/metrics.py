@@ -0,0 +1,111 @@
+"""Runtime metrics for IPBuilding requests and refreshes."""
+from __future__ import annotations
+
+from bisect import bisect_left
+from dataclasses import dataclass, field
+from typing import Any
+
+# Upper bounds of the latency buckets, in milliseconds (the last bucket is open)
+LATENCY_BUCKETS_MS = (10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+
+class LatencyHistogram:
+    """Fixed-bucket latency histogram.
+
+    Memory stays constant however long the integration runs; percentiles are
+    estimated as the upper bound of the bucket they fall in.
+    """
+
+    __slots__ = ("counts", "count", "total", "last", "max")
+
+    def __init__(self) -> None:
+        """Initialize an empty histogram."""
+        self.counts = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.last: float | None = None
+        self.max = 0.0
+
+    def observe(self, seconds: float) -> None:
+        """Record one duration."""
+        ms = seconds * 1000
+        self.counts[bisect_left(LATENCY_BUCKETS_MS, ms)] += 1
+        self.count += 1
+        self.total += ms
+        self.last = ms
+        self.max = max(self.max, ms)
+
+    def percentile(self, pct: float) -> float | None:
+        """Return the estimated percentile in ms, None without samples."""
+        if not self.count:
+            return None
+        rank = self.count * pct / 100
+        seen = 0
+        for bound, count in zip(LATENCY_BUCKETS_MS, self.counts):
+            seen += count
+            if seen >= rank:
+                return min(float(bound), self.max)
+        return self.max
+
+    @property
+    def mean(self) -> float | None:
+        """Return the mean in ms, None without samples."""
+        return self.total / self.count if self.count else None
+
+    def as_dict(self) -> dict[str, Any]:
+        """Return a summary for diagnostics."""
+        buckets = {f"le_{bound}ms": count for bound, count in zip(LATENCY_BUCKETS_MS, self.counts)}
+        buckets[f"gt_{LATENCY_BUCKETS_MS[-1]}ms"] = self.counts[-1]
+        return {
+            "count": self.count,
+            "last_ms": self.last,
+            "mean_ms": self.mean,
+            "p50_ms": self.percentile(50),
+            "p99_ms": self.percentile(99),
+            "max_ms": self.max,
+            "buckets": buckets,
+        }
+
+
+@dataclass(slots=True)
+class RequestMetrics:
+    """Latency, size and outcome counters of one kind of controller request."""
+
+    latency: LatencyHistogram = field(default_factory=LatencyHistogram)
+    requests: int = 0
+    errors: int = 0
+    timeouts: int = 0
+    bytes: int = 0
+    items: int = 0
+    last_bytes: int | None = None
+    last_items: int | None = None
+
+    def record(self, seconds: float, size: int, items: int = 0) -> None:
+        """Record a successful request."""
+        self.latency.observe(seconds)
+        self.requests += 1
+        self.bytes += size
+        self.items += items
+        self.last_bytes = size
+        self.last_items = items
+
+    def record_error(self, seconds: float, timeout: bool) -> None:
+        """Record a failed request."""
+        self.latency.observe(seconds)
+        self.requests += 1
+        self.errors += 1
+        if timeout:
+            self.timeouts += 1
+
+    def as_dict(self) -> dict[str, Any]:
+        """Return a summary for diagnostics."""
+        return {
+            "requests": self.requests,
+            "errors": self.errors,
+            "timeouts": self.timeouts,
+            "bytes": self.bytes,
+            "items": self.items,
+            "last_bytes": self.last_bytes,
+            "last_items": self.last_items,
+            "latency": self.latency.as_dict(),
+        }
@@ -0,0 +1,165 @@
+"""Normalized device records for IPBuilding."""
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from itertools import product
+from typing import Any
+
+
+def _int_or_none(value: Any) -> int | None:
+    """Convert to int, returning None for missing or non-numeric values."""
+    if value is None:
+        return None
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+# State fields in the order of the presence flags from_dict computes, and the
+# `present` value for every combination of flags (None when all are present)
+_STATE_FIELDS = ("status", "value", "visible", "watt")
+_PRESENT: dict[tuple[bool, ...], frozenset[str] | None] = {
+    flags: (
+        None
+        if all(flags)
+        else frozenset(name for name, flag in zip(_STATE_FIELDS, flags) if flag)
+    )
+    for flags in product((False, True), repeat=len(_STATE_FIELDS))
+}
+
+
+def _level(value: Any) -> int:
+    """Return the 0-100 output level for a raw Status/Value."""
+    if isinstance(value, bool):
+        return 100 if value else 0
+    try:
+        return int(value or 0)
+    except (TypeError, ValueError):
+        # Non-numeric values (e.g. the system time) have no output level
+        return 0
+
+
+@dataclass(slots=True)
+class IPBuildingDevice:
+    """A single controller item, parsed once from the comp/items payload.
+
+    Only the fields the integration uses are kept. `level` is the numeric
+    output level (0-100 for dimmers, 0/1 for relays) derived from
+    Status/Value, so platforms don't have to repeat the fallback chain.
+
+    `present` names the state fields the raw item carried, None when it had
+    all of them. A push event or projected poll may leave fields out; those
+    are then defaults here and must not overwrite a stored record (see
+    update_state). On a stored record it is that of the last full poll, so
+    it also tells whether the controller reports Watt for the device.
+    """
+
+    id: int
+    type: int
+    kind: int | None = None
+    description: str | None = None
+    status: Any = None
+    value: Any = None
+    level: int = 0
+    watt: float | None = None
+    visible: bool = True
+    group: str | None = None
+    group_id: int | None = None
+    ip_address: str | None = None
+    port: int | None = None
+    protocol: int | None = None
+    output: int | None = None
+    present: frozenset[str] | None = field(default=None, compare=False, repr=False)
+
+    @classmethod
+    def from_dict(cls, data: dict[str, Any]) -> IPBuildingDevice | None:
+        """Build a record from a raw controller item, None if it has no ID."""
+        device_id = _int_or_none(data.get("ID") or data.get("id"))
+        if device_id is None:
+            return None
+
+        status = data.get("Status")
+        if status is None:
+            status = data.get("status")
+        value = data.get("Value")
+        if value is None:
+            value = data.get("value")
+        watt = data.get("Watt")
+        group = data.get("Group") or {}
+
+        return cls(
+            id=device_id,
+            type=_int_or_none(data.get("Type") or data.get("type")) or 0,
+            kind=_int_or_none(data.get("Kind")),
+            description=data.get("Description") or data.get("name"),
+            status=status,
+            value=value,
+            level=_level(status or value),
+            watt=float(watt) if watt is not None else None,
+            visible=bool(data.get("Visible", True)),
+            group=group.get("Name"),
+            group_id=_int_or_none(group.get("ID")),
+            ip_address=data.get("IpAddress"),
+            port=_int_or_none(data.get("Port")),
+            protocol=_int_or_none(data.get("Protocol")),
+            output=_int_or_none(data.get("Output")),
+            present=_PRESENT[(
+                "Status" in data or "status" in data,
+                "Value" in data or "value" in data,
+                "Visible" in data,
+                "Watt" in data,
+            )],
+        )
+
+    @property
+    def is_on(self) -> bool:
+        """Return True if the output is on."""
+        return self.level > 0
+
+    @property
+    def has_watt(self) -> bool:
+        """Return True if the item carries a Watt key, even a null one."""
+        return self.present is None or "watt" in self.present
+
+    @property
+    def status_level(self) -> int:
+        """Return the level from Status, or from Value only when Status is None."""
+        return _level(self.status if self.status is not None else self.value)
+
+    def state_differs(self, other: IPBuildingDevice, partial: bool = False) -> bool:
+        """Return True if the state-relevant fields differ from another record.
+
+        With `partial`, only the fields the other record carries are compared.
+        """
+        present = other.present
+        if not partial or present is None:
+            return (
+                self.status != other.status
+                or self.value != other.value
+                or self.visible != other.visible
+                or self.watt != other.watt
+            )
+        return any(getattr(self, name) != getattr(other, name) for name in present)
+
+    def update_state(self, other: IPBuildingDevice) -> None:
+        """Copy the state fields another (possibly partial) record carries."""
+        present = other.present
+        if present is None:
+            self.status = other.status
+            self.value = other.value
+            self.level = other.level
+            self.visible = other.visible
+            self.watt = other.watt
+            return
+        for name in present:
+            setattr(self, name, getattr(other, name))
+        self.level = _level(self.status or self.value)
+
+    def set_level(self, level: int) -> None:
+        """Apply an output level, as after a successful command."""
+        self.status = level
+        # Only mirror into Value when the controller reports it for this device
+        if self.value is not None:
+            self.value = level
+        self.level = level
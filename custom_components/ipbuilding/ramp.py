@@ -0,0 +1,181 @@
+"""Dimmer transitions for IPBuilding."""
+from __future__ import annotations
+
+import asyncio
+import logging
+from functools import partial
+from time import monotonic
+from typing import TYPE_CHECKING
+
+from homeassistant.core import callback
+
+from .const import RAMP_MAX_COMMANDS_PER_SECOND, RAMP_STEP_INTERVAL
+
+if TYPE_CHECKING:
+    from .coordinator import IPBuildingCoordinator
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class TokenBucket:
+    """Caps the rate of transition steps sent to one controller.
+
+    Waiters are served in order (asyncio.Lock is fair), so many fades share
+    the rate evenly instead of the first one starving the rest.
+    """
+
+    def __init__(self, rate: float, burst: float | None = None) -> None:
+        """Initialize a full bucket."""
+        self.rate = rate
+        self.burst = burst if burst is not None else rate
+        self._tokens = self.burst
+        self._updated = monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self) -> None:
+        now = monotonic()
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self) -> None:
+        """Wait for a token."""
+        async with self._lock:
+            self._refill()
+            if self._tokens < 1:
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+                self._refill()
+            self._tokens -= 1
+
+
+class RampEngine:
+    """Runs dimmer transitions as a series of DIM commands.
+
+    Each step is computed from the time elapsed since the transition started,
+    on the dimmer's 0-100 scale, and only sent when the level changed. The
+    next step is only computed once the previous command was answered, so
+    when the controller (or the rate cap) lags, the intermediate steps it
+    missed are dropped instead of queued, and steps never arrive out of order.
+    The target level is always sent last.
+
+    Transitions run as background tasks tracked per device, so a service
+    call returns after the first step. One transition runs per device; any
+    other command to the device (see
+    IPBuildingCoordinator.async_send_command) cancels it. All transitions of
+    a controller share one TokenBucket.
+    """
+
+    def __init__(
+        self,
+        coordinator: IPBuildingCoordinator,
+        rate: float = RAMP_MAX_COMMANDS_PER_SECOND,
+        step_interval: float = RAMP_STEP_INTERVAL,
+    ) -> None:
+        """Initialize the engine."""
+        self._coordinator = coordinator
+        self._bucket = TokenBucket(rate)
+        self._step_interval = step_interval
+        self._ramps: dict[int, asyncio.Task] = {}
+        self.started = 0
+        self.superseded = 0
+        self.steps_sent = 0
+
+    @property
+    def active(self) -> int:
+        """Number of transitions running."""
+        return len(self._ramps)
+
+    async def async_ramp(self, device_id: int, target: int, duration: float) -> None:
+        """Start fading a dimmer to `target` (0-100) over `duration` seconds.
+
+        Returns once the first step was answered, raising if it failed; the
+        rest of the transition runs in the background until the target was
+        sent or a newer command superseded it.
+        """
+        self.cancel(device_id)
+        device = self._coordinator.data.get(device_id)
+        start = device.level if device is not None else 0
+        first: asyncio.Future[None] = asyncio.get_running_loop().create_future()
+        task = self._coordinator.hass.async_create_background_task(
+            self._async_run(device_id, start, target, duration, first),
+            f"ipbuilding_ramp_{device_id}",
+        )
+        task.add_done_callback(partial(self._async_ramp_done, device_id, first))
+        self._ramps[device_id] = task
+        self.started += 1
+        await asyncio.shield(first)
+
+    @callback
+    def _async_ramp_done(self, device_id: int, first: asyncio.Future[None], task: asyncio.Task) -> None:
+        if self._ramps.get(device_id) is task:
+            del self._ramps[device_id]
+        error = None if task.cancelled() else task.exception()
+        if not first.done():
+            # Superseded before its first step, or that step failed
+            if error is not None:
+                first.set_exception(error)
+            else:
+                first.set_result(None)
+        elif error is not None:
+            _LOGGER.warning("Transition of IPBuilding device %s stopped: %s", device_id, error)
+
+    def cancel(self, device_id: int) -> None:
+        """Stop the transition of a device, if one is running."""
+        if (task := self._ramps.pop(device_id, None)) is not None and not task.done():
+            task.cancel()
+            self.superseded += 1
+
+    def cancel_all(self) -> None:
+        """Stop every transition."""
+        for device_id in list(self._ramps):
+            self.cancel(device_id)
+
+    async def _async_run(
+        self, device_id: int, start: int, target: int, duration: float, first: asyncio.Future[None]
+    ) -> None:
+        coordinator = self._coordinator
+        began = monotonic()
+        sent = start
+        token = False
+        while duration > 0 and (fraction := (monotonic() - began) / duration) < 1:
+            level = round(start + (target - start) * fraction)
+            if level != sent:
+                await self._bucket.acquire()
+                # Recompute after waiting for the rate cap, skipping what was missed
+                fraction = min(1.0, (monotonic() - began) / duration)
+                level = round(start + (target - start) * fraction)
+                if level == target:
+                    token = True
+                    break
+                await coordinator.async_send_command(device_id, level, "DIM", ramp_step=True)
+                self.steps_sent += 1
+                if not first.done():
+                    first.set_result(None)
+                sent = level
+            await asyncio.sleep(self._step_interval)
+
+        if not token:
+            await self._bucket.acquire()
+        await coordinator.async_send_command(
+            device_id, target, "DIM" if target else "OFF", ramp_step=True
+        )
+        self.steps_sent += 1
+        if not first.done():
+            first.set_result(None)
+        _LOGGER.debug(
+            "Transition of device %s from %s to %s done in %.1fs",
+            device_id,
+            start,
+            target,
+            monotonic() - began,
+        )
+        await coordinator.async_confirm_commands((device_id,))
+
+    def as_dict(self) -> dict[str, float]:
+        """Return the transition counters for diagnostics."""
+        return {
+            "active": self.active,
+            "started": self.started,
+            "superseded": self.superseded,
+            "steps_sent": self.steps_sent,
+            "rate_cap_per_s": self._bucket.rate,
+        }
@@ -4,11 +4,14 @@ from typing import Any
 
 from homeassistant.components.scene import Scene
 from homeassistant.config_entries import ConfigEntry
-from homeassistant.core import HomeAssistant
+from homeassistant.core import HomeAssistant, callback
 from homeassistant.helpers.entity_platform import AddEntitiesCallback
 
 from .const import DOMAIN, TYPE_SPHERE, TYPE_TEMP_SPHERE
 from .api import IPBuildingAPI
+from .coordinator import IPBuildingCoordinator
+from .entity import IPBuildingEntity
+from .models import IPBuildingDevice
 
 _LOGGER = logging.getLogger(__name__)
 
@@ -20,72 +23,39 @@ async def async_setup_entry(
     """Set up the IPBuilding scene platform."""
     data = hass.data[DOMAIN][entry.entry_id]
     api: IPBuildingAPI = data["api"]
+    coordinator: IPBuildingCoordinator = data["coordinator"]
 
-    entities = []
-    
-    # Fetch Sphere scenes
-    try:
-        sphere_devices = await api.get_devices(TYPE_SPHERE)
-        for device in sphere_devices:
-            entities.append(IPBuildingScene(api, device))
-    except Exception as e:
-        _LOGGER.error("Failed to fetch spheres: %s", e)
+    @callback
+    def async_add_devices(devices: list[IPBuildingDevice]) -> None:
+        """Add Sphere and TempSphere scenes."""
+        async_add_entities(
+            IPBuildingScene(coordinator, api, device)
+            for device in devices
+            if device.type in (TYPE_SPHERE, TYPE_TEMP_SPHERE)
+        )
 
-    # Fetch TempSphere scenes
-    try:
-        temp_sphere_devices = await api.get_devices(TYPE_TEMP_SPHERE)
-        for device in temp_sphere_devices:
-            entities.append(IPBuildingScene(api, device))
-    except Exception as e:
-        _LOGGER.error("Failed to fetch temp spheres: %s", e)
+    # From the startup snapshot (no extra fetch needed), later scenes come from the full sweeps
+    async_add_devices(coordinator.data.by_type(TYPE_SPHERE, TYPE_TEMP_SPHERE))
+    entry.async_on_unload(coordinator.async_add_device_listener(async_add_devices))
 
-    async_add_entities(entities, True)
 
-
-class IPBuildingScene(Scene):
+class IPBuildingScene(IPBuildingEntity, Scene):
     """Representation of an IPBuilding Scene (Sphere)."""
 
-    _attr_has_entity_name = True
-
-    def __init__(self, api: IPBuildingAPI, device: dict) -> None:
+    def __init__(self, coordinator: IPBuildingCoordinator, api: IPBuildingAPI, device: IPBuildingDevice) -> None:
         """Initialize the scene."""
-        self._api = api
-        self._device = device
-        self._attr_unique_id = f"ipbuilding_scene_{device.get('ID') or device.get('id')}"
-        self._attr_name = device.get("Description") or device.get("name") or f"Scene {device.get('ID') or device.get('id')}"
-        
-        # Device Info
-        self._attr_device_info = {
-            "identifiers": {(DOMAIN, f"scene_{device.get('ID') or device.get('id')}")},
-            "name": self._attr_name,
-            "manufacturer": "IPBuilding",
-            "model": "Scene",
-            "via_device": (DOMAIN, "hub_scenes"),
-        }
-        if group := device.get("Group"):
-            self._attr_device_info["suggested_area"] = group.get("Name")
-
-    @property
-    def available(self) -> bool:
-        """Return if entity is available."""
-        # Use Visible property from API, default to True
-        return self._device.get("Visible", True)
+        super().__init__(coordinator, api, device)
+        self._attr_unique_id = self._unique_id("scene")
+        self._attr_name = device.description or f"Scene {self._device_id}"
 
-    @property
-    def extra_state_attributes(self) -> dict[str, Any]:
-        """Return the state attributes."""
-        return {
-            "IpAddress": self._device.get("IpAddress"),
-            "Port": self._device.get("Port"),
-            "Protocol": self._device.get("Protocol"),
-            "ID": self._device.get("ID") or self._device.get("id"),
-            "Status": self._device.get("Status"),
-            "Output": self._device.get("Output"),
-            "Kind": self._device.get("Kind"),
-        }
+    def _update_attrs(self, d: IPBuildingDevice) -> None:
+        """Compute availability and state attributes."""
+        super()._update_attrs(d)
+        # Use Visible property from API, refreshed by the coordinator's full sweeps
+        self._available = d.visible
 
     async def async_activate(self, **kwargs: Any) -> None:
         """Activate the scene."""
         # Assuming activating a scene is done by setting its value to 1 or calling an action
         # Similar to buttons, we'll try setting value to 1 with actionType ON
-        await self._api.set_value(self._device.get('ID') or self._device.get('id'), 1, "ON")
+        await self.coordinator.async_send_command(self._device_id, 1, "ON", optimistic=False)
@@ -0,0 +1,76 @@
+"""Poll scheduling shared by all IPBuilding controllers."""
+from __future__ import annotations
+
+import asyncio
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+from time import monotonic
+
+from homeassistant.core import HomeAssistant, callback
+
+from .const import DATA_SCHEDULER, POLL_MAX_CONCURRENT
+from .metrics import LatencyHistogram
+
+
+class PollScheduler:
+    """Caps how many controllers are polled at once, across all config entries.
+
+    Every controller keeps its own coordinator, timer and connection pool, so
+    polls of different buildings run concurrently and fail independently.
+    The scheduler only bounds the total: a poll waits for a free slot, which
+    is released when the poll ends, fails or times out (REQUEST_TIMEOUT), so
+    a slow building never holds a slot longer than one request.
+    """
+
+    def __init__(self, limit: int = POLL_MAX_CONCURRENT) -> None:
+        """Initialize the scheduler."""
+        self._semaphore = asyncio.Semaphore(limit)
+        self._entries: set[str] = set()
+        self.limit = limit
+        self.active = 0
+        # Time polls spent waiting for a slot
+        self.wait_latency = LatencyHistogram()
+
+    @property
+    def entries(self) -> set[str]:
+        """Return the config entries using the scheduler."""
+        return set(self._entries)
+
+    def register(self, entry_id: str) -> None:
+        """Add a config entry."""
+        self._entries.add(entry_id)
+
+    def unregister(self, entry_id: str) -> bool:
+        """Remove a config entry, return True when no entries are left."""
+        self._entries.discard(entry_id)
+        return not self._entries
+
+    @asynccontextmanager
+    async def slot(self) -> AsyncIterator[None]:
+        """Wait for a free poll slot and hold it for the duration of the block."""
+        start = monotonic()
+        async with self._semaphore:
+            self.wait_latency.observe(monotonic() - start)
+            self.active += 1
+            try:
+                yield
+            finally:
+                self.active -= 1
+
+
+@callback
+def async_register(hass: HomeAssistant, entry_id: str) -> PollScheduler:
+    """Return the shared scheduler, creating it for the first entry."""
+    if (scheduler := hass.data.get(DATA_SCHEDULER)) is None:
+        scheduler = hass.data[DATA_SCHEDULER] = PollScheduler()
+    scheduler.register(entry_id)
+    return scheduler
+
+
+@callback
+def async_unregister(hass: HomeAssistant, entry_id: str) -> None:
+    """Release the scheduler for an entry, dropping it after the last one."""
+    if (scheduler := hass.data.get(DATA_SCHEDULER)) is None:
+        return
+    if scheduler.unregister(entry_id):
+        del hass.data[DATA_SCHEDULER]
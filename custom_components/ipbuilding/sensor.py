@@ -1,16 +1,27 @@
 """Sensor platform for IPBuilding."""
 import logging
-
-from homeassistant.components.sensor import SensorEntity, SensorDeviceClass, SensorStateClass
-from homeassistant.const import UnitOfPower
+from collections.abc import Callable
+from dataclasses import dataclass
+
+from homeassistant.components.sensor import (
+    SensorEntity,
+    SensorEntityDescription,
+    SensorDeviceClass,
+    SensorStateClass,
+)
+from homeassistant.const import EntityCategory, UnitOfInformation, UnitOfPower, UnitOfTime
 from homeassistant.config_entries import ConfigEntry
-from homeassistant.core import HomeAssistant
+from homeassistant.core import HomeAssistant, callback
 from homeassistant.helpers.entity_platform import AddEntitiesCallback
-from homeassistant.helpers.update_coordinator import CoordinatorEntity, DataUpdateCoordinator
+from homeassistant.helpers.update_coordinator import CoordinatorEntity
 from typing import Any
 
 from .const import DOMAIN, TYPE_TIME, TYPE_REGIME, TYPE_RELAY, TYPE_DIMMER
 from .api import IPBuildingAPI
+from .coordinator import IPBuildingCoordinator
+from .devices import scoped_identifier
+from .entity import IPBuildingEntity
+from .models import IPBuildingDevice
 
 _LOGGER = logging.getLogger(__name__)
 
@@ -22,162 +33,215 @@ async def async_setup_entry(
     """Set up the IPBuilding sensor platform."""
     data = hass.data[DOMAIN][entry.entry_id]
     api: IPBuildingAPI = data["api"]
-    coordinator: DataUpdateCoordinator = data["coordinator"]
-
-    entities = []
-    
-    if coordinator.data:
-        # Time Sensors
-        for dev_id, device in coordinator.data.items():
-            if int(device.get("Type") or 0) == TYPE_TIME:
-                 entities.append(IPBuildingSensor(coordinator, api, device, "Time", "hub_system"))
-        
-        # Regime Sensors
-        for dev_id, device in coordinator.data.items():
-            if int(device.get("Type") or 0) == TYPE_REGIME:
-                 entities.append(IPBuildingSensor(coordinator, api, device, "Regime", "hub_system"))
-        
-        # Power Sensors (Relays and Dimmers)
-        for dev_id, device in coordinator.data.items():
-            dtype = int(device.get("Type") or 0)
-            if dtype in [TYPE_RELAY, TYPE_DIMMER]:
-                if "Watt" in device:
-                    entities.append(IPBuildingPowerSensor(coordinator, api, device))
-
-    async_add_entities(entities)
-
-
-class IPBuildingSensor(CoordinatorEntity, SensorEntity):
+    coordinator: IPBuildingCoordinator = data["coordinator"]
+
+    @callback
+    def async_add_devices(devices: list[IPBuildingDevice]) -> None:
+        """Add time, regime and power sensors for the given devices."""
+        entities = []
+        for device in devices:
+            # Time and Regime Sensors
+            if device.type == TYPE_TIME:
+                entities.append(IPBuildingSensor(coordinator, api, device, "Time"))
+            elif device.type == TYPE_REGIME:
+                entities.append(IPBuildingSensor(coordinator, api, device, "Regime"))
+            # Power Sensors (Relays and Dimmers)
+            elif device.type in (TYPE_RELAY, TYPE_DIMMER) and device.has_watt:
+                entities.append(IPBuildingPowerSensor(coordinator, api, device))
+        async_add_entities(entities)
+
+    async_add_devices(coordinator.data.by_type(TYPE_TIME, TYPE_REGIME, TYPE_RELAY, TYPE_DIMMER))
+    entry.async_on_unload(coordinator.async_add_device_listener(async_add_devices))
+
+    # Diagnostic sensors on the system hub (disabled by default)
+    async_add_entities(
+        IPBuildingDiagnosticSensor(coordinator, entry, description)
+        for description in DIAGNOSTIC_SENSORS
+    )
+
+
+@dataclass(frozen=True, kw_only=True)
+class IPBuildingDiagnosticSensorDescription(SensorEntityDescription):
+    """Describes a diagnostic sensor read from the API and coordinator metrics."""
+
+    value_fn: Callable[[IPBuildingCoordinator], Any]
+
+
+DIAGNOSTIC_SENSORS: tuple[IPBuildingDiagnosticSensorDescription, ...] = (
+    IPBuildingDiagnosticSensorDescription(
+        key="poll_latency",
+        name="Poll latency",
+        native_unit_of_measurement=UnitOfTime.MILLISECONDS,
+        device_class=SensorDeviceClass.DURATION,
+        state_class=SensorStateClass.MEASUREMENT,
+        suggested_display_precision=0,
+        value_fn=lambda c: c.api.fetch_metrics.latency.last,
+    ),
+    IPBuildingDiagnosticSensorDescription(
+        key="poll_size",
+        name="Poll response size",
+        native_unit_of_measurement=UnitOfInformation.BYTES,
+        device_class=SensorDeviceClass.DATA_SIZE,
+        state_class=SensorStateClass.MEASUREMENT,
+        value_fn=lambda c: c.api.fetch_metrics.last_bytes,
+    ),
+    IPBuildingDiagnosticSensorDescription(
+        key="poll_items",
+        name="Poll items",
+        state_class=SensorStateClass.MEASUREMENT,
+        value_fn=lambda c: c.api.fetch_metrics.last_items,
+    ),
+    IPBuildingDiagnosticSensorDescription(
+        key="poll_errors",
+        name="Poll errors",
+        state_class=SensorStateClass.TOTAL_INCREASING,
+        value_fn=lambda c: c.api.fetch_metrics.errors,
+    ),
+    IPBuildingDiagnosticSensorDescription(
+        key="poll_timeouts",
+        name="Poll timeouts",
+        state_class=SensorStateClass.TOTAL_INCREASING,
+        value_fn=lambda c: c.api.fetch_metrics.timeouts,
+    ),
+    IPBuildingDiagnosticSensorDescription(
+        key="merge_duration",
+        name="Merge duration",
+        native_unit_of_measurement=UnitOfTime.MILLISECONDS,
+        device_class=SensorDeviceClass.DURATION,
+        state_class=SensorStateClass.MEASUREMENT,
+        suggested_display_precision=1,
+        value_fn=lambda c: c.merge_latency.last,
+    ),
+    IPBuildingDiagnosticSensorDescription(
+        key="entities_notified",
+        name="Entities notified",
+        state_class=SensorStateClass.MEASUREMENT,
+        value_fn=lambda c: c.last_notified_count,
+    ),
+    IPBuildingDiagnosticSensorDescription(
+        key="command_latency",
+        name="Command latency",
+        native_unit_of_measurement=UnitOfTime.MILLISECONDS,
+        device_class=SensorDeviceClass.DURATION,
+        state_class=SensorStateClass.MEASUREMENT,
+        suggested_display_precision=0,
+        value_fn=lambda c: c.api.command_metrics.latency.last,
+    ),
+    IPBuildingDiagnosticSensorDescription(
+        key="command_errors",
+        name="Command errors",
+        state_class=SensorStateClass.TOTAL_INCREASING,
+        value_fn=lambda c: c.api.command_metrics.errors,
+    ),
+    IPBuildingDiagnosticSensorDescription(
+        key="command_queue",
+        name="Command queue",
+        state_class=SensorStateClass.MEASUREMENT,
+        value_fn=lambda c: c.api.queue_depth,
+    ),
+)
+
+
+class IPBuildingSensor(IPBuildingEntity, SensorEntity):
     """Representation of an IPBuilding Sensor."""
 
-    _attr_has_entity_name = True
-
-    def __init__(self, coordinator: DataUpdateCoordinator, api: IPBuildingAPI, device: dict, sensor_type: str, hub: str) -> None:
+    def __init__(self, coordinator: IPBuildingCoordinator, api: IPBuildingAPI, device: IPBuildingDevice, sensor_type: str) -> None:
         """Initialize the sensor."""
-        super().__init__(coordinator)
-        self._api = api
+        super().__init__(coordinator, api, device)
         self._sensor_type = sensor_type
-        self._device_id = device.get("ID") or device.get("id")
-        self._initial_device_data = device
-        
-        self._attr_unique_id = f"ipbuilding_sensor_{self._device_id}"
-        self._attr_name = device.get("Description") or device.get("name") or f"{sensor_type} {self._device_id}"
-        
-        self._attr_entity_registry_visible_default = False
-        
-        # Device Info
-        self._attr_device_info = {
-            "identifiers": {(DOMAIN, f"sensor_{self._device_id}")},
-            "name": self._attr_name,
-            "manufacturer": "IPBuilding",
-            "model": sensor_type,
-            "via_device": (DOMAIN, hub),
-        }
-        if group := device.get("Group"):
-            self._attr_device_info["suggested_area"] = group.get("Name")
+        self._native_value: Any = None
 
-    @property
-    def _device_data(self) -> dict:
-        """Get the latest device data from coordinator."""
-        return self.coordinator.data.get(self._device_id, self._initial_device_data)
+        self._attr_unique_id = self._unique_id("sensor")
+        self._attr_name = device.description or f"{sensor_type} {self._device_id}"
 
-    @property
-    def available(self) -> bool:
-        """Return if entity is available."""
-        return self.coordinator.last_update_success and self._device_data.get("Visible", True)
+        self._attr_entity_registry_visible_default = False
+
+    def _update_attrs(self, d: IPBuildingDevice) -> None:
+        """Compute the sensor value."""
+        super()._update_attrs(d)
+        self._native_value = d.value
 
     @property
     def native_value(self) -> Any:
         """Return the state of the sensor."""
-        d = self._device_data
-        return d.get("Value") or d.get("value")
+        return self._native_value
 
-    @property
-    def extra_state_attributes(self) -> dict[str, Any]:
-        """Return the state attributes."""
-        d = self._device_data
-        return {
-            "IpAddress": d.get("IpAddress"),
-            "Port": d.get("Port"),
-            "Protocol": d.get("Protocol"),
-            "ID": self._device_id,
-            "Status": d.get("Status"),
-            "Output": d.get("Output"),
-            "Kind": d.get("Kind"),
-        }
-
-
-class IPBuildingPowerSensor(CoordinatorEntity, SensorEntity):
+
+class IPBuildingPowerSensor(IPBuildingEntity, SensorEntity):
     """Representation of an IPBuilding Power Sensor."""
 
-    _attr_has_entity_name = True
     _attr_device_class = SensorDeviceClass.POWER
     _attr_native_unit_of_measurement = UnitOfPower.WATT
     _attr_state_class = SensorStateClass.MEASUREMENT
 
-    def __init__(self, coordinator: DataUpdateCoordinator, api: IPBuildingAPI, device: dict) -> None:
+    def __init__(self, coordinator: IPBuildingCoordinator, api: IPBuildingAPI, device: IPBuildingDevice) -> None:
         """Initialize the power sensor."""
-        super().__init__(coordinator)
-        self._api = api
-        self._device_id = device.get("ID") or device.get("id")
-        self._initial_device_data = device
-        
-        self._attr_unique_id = f"ipbuilding_power_{self._device_id}"
-        self._attr_name = f"{device.get('Description') or device.get('name')} Power"
-        
+        super().__init__(coordinator, api, device)
+        self._native_value = 0.0
+
+        self._attr_unique_id = self._unique_id("power")
+        self._attr_name = f"{device.description} Power"
+
         # Hide state display by default
         self._attr_entity_registry_visible_default = False
 
-        # Device Info
-        hub = "hub_dimmers" if int(device.get("Type") or 0) == TYPE_DIMMER else "hub_relays"
-        self._attr_device_info = {
-            "identifiers": {(DOMAIN, f"output_{self._device_id}")},
-            "name": device.get("Description") or device.get("name") or f"Device {self._device_id}",
-            "manufacturer": "IPBuilding",
-            "model": "Dimmer" if int(device.get("Type") or 0) == TYPE_DIMMER else "Relay",
-            "via_device": (DOMAIN, hub),
-        }
-        if group := device.get("Group"):
-            self._attr_device_info["suggested_area"] = group.get("Name")
-
-    @property
-    def _device_data(self) -> dict:
-        """Get the latest device data from coordinator."""
-        return self.coordinator.data.get(self._device_id, self._initial_device_data)
+    def _state_attributes(self, d: IPBuildingDevice) -> None:
+        """No attributes, the parent light/switch already carries them."""
+        return None
 
-    @property
-    def available(self) -> bool:
-        """Return if entity is available."""
-        return self.coordinator.last_update_success and self._device_data.get("Visible", True)
+    def _update_attrs(self, d: IPBuildingDevice) -> None:
+        """Compute the power usage."""
+        super()._update_attrs(d)
+        self._native_value = self._calculate_power(d)
 
     @property
     def native_value(self) -> float:
         """Return the state of the sensor."""
-        return self._calculate_power()
+        return self._native_value
 
-    def _calculate_power(self) -> float:
+    def _calculate_power(self, d: IPBuildingDevice) -> float:
         """Calculate the power usage based on state."""
-        d = self._device_data
-        rated_watt = float(d.get("Watt") or 0)
-        
-        val = d.get("Status")
-        if val is None:
-            val = d.get("status")
-        if val is None:
-            val = d.get("Value")
-        if val is None:
-            val = d.get("value")
-
-        if isinstance(val, bool):
-            val = 1 if val else 0
-        else:
-            val = int(val or 0)
-
-        type_id = int(d.get("Type") or d.get("type") or 0)
-        
-        if type_id == TYPE_DIMMER:
+        rated_watt = d.watt or 0.0
+        level = d.status_level
+
+        if d.type == TYPE_DIMMER:
              # Dimmer value is 0-100
-             return round(rated_watt * (val / 100.0), 1)
-        
+             return round(rated_watt * (level / 100.0), 1)
+
         # Binary ON/OFF
-        return rated_watt if val > 0 else 0
+        return rated_watt if level > 0 else 0
+
+
+class IPBuildingDiagnosticSensor(CoordinatorEntity[IPBuildingCoordinator], SensorEntity):
+    """Request and refresh metrics of the integration itself.
+
+    Subscribed without a device context, so it is updated after every refresh.
+    """
+
+    _attr_has_entity_name = True
+    _attr_entity_category = EntityCategory.DIAGNOSTIC
+    _attr_entity_registry_enabled_default = False
+
+    entity_description: IPBuildingDiagnosticSensorDescription
+
+    def __init__(
+        self,
+        coordinator: IPBuildingCoordinator,
+        entry: ConfigEntry,
+        description: IPBuildingDiagnosticSensorDescription,
+    ) -> None:
+        """Initialize the diagnostic sensor."""
+        super().__init__(coordinator)
+        self.entity_description = description
+        self._attr_unique_id = f"{entry.entry_id}_{description.key}"
+        self._attr_device_info = {"identifiers": {scoped_identifier(entry.entry_id, "hub_system")}}
+
+    @property
+    def available(self) -> bool:
+        """Stay available while polls fail, that's when the metrics matter."""
+        return True
+
+    @property
+    def native_value(self) -> Any:
+        """Return the current metric value."""
+        return self.entity_description.value_fn(self.coordinator)
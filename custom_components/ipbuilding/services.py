@@ -0,0 +1,123 @@
+"""Services for the IPBuilding integration."""
+from __future__ import annotations
+
+import logging
+from typing import Any
+
+import voluptuous as vol
+
+from homeassistant.core import HomeAssistant, ServiceCall, ServiceResponse, SupportsResponse, callback
+from homeassistant.exceptions import ServiceValidationError
+import homeassistant.helpers.config_validation as cv
+
+from .const import DOMAIN, TYPE_DIMMER, TYPE_RELAY
+
+_LOGGER = logging.getLogger(__name__)
+
+SERVICE_SET_MANY = "set_many"
+
+ATTR_CONFIG_ENTRY_ID = "config_entry_id"
+ATTR_DEVICES = "devices"
+ATTR_GROUP = "group"
+ATTR_VALUE = "value"
+ATTR_ID = "id"
+
+# Outputs set_many can drive
+OUTPUT_TYPES = (TYPE_RELAY, TYPE_DIMMER)
+
+_DEVICE_SCHEMA = vol.Any(
+    vol.Coerce(int),
+    vol.Schema(
+        {
+            vol.Required(ATTR_ID): vol.Coerce(int),
+            vol.Required(ATTR_VALUE): vol.All(vol.Coerce(int), vol.Range(min=0, max=100)),
+        }
+    ),
+)
+
+SET_MANY_SCHEMA = vol.All(
+    vol.Schema(
+        {
+            vol.Optional(ATTR_CONFIG_ENTRY_ID): cv.string,
+            vol.Optional(ATTR_DEVICES): vol.All(cv.ensure_list, [_DEVICE_SCHEMA]),
+            vol.Optional(ATTR_GROUP): cv.string,
+            vol.Optional(ATTR_VALUE): vol.All(vol.Coerce(int), vol.Range(min=0, max=100)),
+        }
+    ),
+    cv.has_at_least_one_key(ATTR_DEVICES, ATTR_GROUP),
+)
+
+
+def _action_type(device_type: int | None, value: int) -> str:
+    """Return the action for a value: OFF, DIM for dimmers, ON for relays."""
+    if value == 0:
+        return "OFF"
+    return "DIM" if device_type == TYPE_DIMMER else "ON"
+
+
+@callback
+def async_setup_services(hass: HomeAssistant) -> None:
+    """Register the IPBuilding services."""
+
+    async def async_set_many(call: ServiceCall) -> ServiceResponse:
+        """Set many outputs in one batch and report the result per device."""
+        entries = hass.data.get(DOMAIN, {})
+        entry_id = call.data.get(ATTR_CONFIG_ENTRY_ID)
+        if entry_id is None:
+            if len(entries) != 1:
+                raise ServiceValidationError(
+                    f"{len(entries)} IPBuilding controllers are loaded, pass config_entry_id"
+                )
+            entry_id = next(iter(entries))
+        if entry_id not in entries:
+            raise ServiceValidationError(f"IPBuilding config entry {entry_id} is not loaded")
+        coordinator = entries[entry_id]["coordinator"]
+        store = coordinator.data
+        default_value = call.data.get(ATTR_VALUE)
+
+        targets: dict[int, int] = {}
+        if ATTR_GROUP in call.data:
+            for device in store.by_group(call.data[ATTR_GROUP]):
+                if device.type in OUTPUT_TYPES:
+                    targets[device.id] = default_value
+        for item in call.data.get(ATTR_DEVICES, ()):
+            if isinstance(item, dict):
+                targets[item[ATTR_ID]] = item[ATTR_VALUE]
+            else:
+                targets[item] = default_value
+        if any(value is None for value in targets.values()):
+            raise ServiceValidationError("Pass a value, or a value for every device")
+
+        results: dict[str, dict[str, Any]] = {}
+        commands: dict[int, tuple[int, str]] = {}
+        for device_id, value in targets.items():
+            device = store.get(device_id)
+            if device is None:
+                results[str(device_id)] = {"success": False, "error": "unknown device"}
+                continue
+            if device.type not in OUTPUT_TYPES:
+                results[str(device_id)] = {"success": False, "error": "not an output"}
+                continue
+            if device.type == TYPE_RELAY and value > 0:
+                # Relays are on or off, whatever level was asked for
+                value = 1
+            commands[device_id] = (value, _action_type(device.type, value))
+
+        errors = await coordinator.async_send_many(commands) if commands else {}
+        for device_id, error in errors.items():
+            results[str(device_id)] = (
+                {"success": True} if error is None else {"success": False, "error": str(error)}
+            )
+
+        failed = sum(1 for result in results.values() if not result["success"])
+        if failed:
+            _LOGGER.warning("set_many: %d of %d IPBuilding outputs failed", failed, len(results))
+        return {"succeeded": len(results) - failed, "failed": failed, "results": results}
+
+    hass.services.async_register(
+        DOMAIN,
+        SERVICE_SET_MANY,
+        async_set_many,
+        schema=SET_MANY_SCHEMA,
+        supports_response=SupportsResponse.OPTIONAL,
+    )
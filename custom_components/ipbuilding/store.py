@@ -0,0 +1,230 @@
+"""Indexed device store for IPBuilding coordinator data."""
+from __future__ import annotations
+
+from collections import deque
+from collections.abc import Iterable, Iterator, Mapping
+from dataclasses import dataclass, field
+
+from .const import STORE_CHANGELOG_SIZE
+from .models import IPBuildingDevice
+
+
+@dataclass(slots=True)
+class MergeResult:
+    """Device IDs affected by a merge."""
+
+    changed: set[int] = field(default_factory=set)
+    added: set[int] = field(default_factory=set)
+    removed: set[int] = field(default_factory=set)
+    unchanged: int = 0
+    # Store revision after the merge
+    revision: int = 0
+
+
+class DeviceStore(Mapping[int, IPBuildingDevice]):
+    """Devices by ID, with secondary indexes by type, type+kind and group.
+
+    The indexes are maintained incrementally as polls merge in, so lookups
+    like "all dimmers" cost O(matching devices) rather than a scan of
+    every device. Index buckets are dicts used as ordered sets, so devices
+    come back in the order the controller first reported them.
+
+    Every merge or in-place change that affects devices bumps the store
+    `revision` once; each affected device records that revision, and a
+    bounded change log of (revision, device ID) lets consumers ask what
+    changed since a revision they saw, without comparing records.
+    """
+
+    def __init__(
+        self, devices: Iterable[IPBuildingDevice] = (), changelog_size: int = STORE_CHANGELOG_SIZE
+    ) -> None:
+        """Initialize the store."""
+        self.revision = 0
+        self._revisions: dict[int, int] = {}
+        self._changelog: deque[tuple[int, int]] = deque()
+        self._changelog_size = changelog_size
+        # Changes up to this revision may have been dropped from the log
+        self._changelog_floor = 0
+        self._devices: dict[int, IPBuildingDevice] = {}
+        self._by_type: dict[int, dict[int, None]] = {}
+        self._by_type_kind: dict[tuple[int, int | None], dict[int, None]] = {}
+        self._by_group: dict[str | None, dict[int, None]] = {}
+        for device in devices:
+            self._add(device)
+
+    def __getitem__(self, device_id: int) -> IPBuildingDevice:
+        return self._devices[device_id]
+
+    def __iter__(self) -> Iterator[int]:
+        return iter(self._devices)
+
+    def __len__(self) -> int:
+        return len(self._devices)
+
+    @property
+    def types(self) -> set[int]:
+        """Return the device types currently present."""
+        return set(self._by_type)
+
+    def type_counts(self) -> dict[int, int]:
+        """Return the number of devices per type."""
+        return {device_type: len(ids) for device_type, ids in self._by_type.items()}
+
+    @property
+    def groups(self) -> set[str]:
+        """Return the group names currently present."""
+        return {group for group in self._by_group if group is not None}
+
+    def revision_of(self, device_id: int) -> int:
+        """Return the revision of a device's last change (0 if never changed)."""
+        return self._revisions.get(device_id, 0)
+
+    def changes_since(self, revision: int) -> set[int] | None:
+        """Return the IDs of devices added, changed or removed after `revision`.
+
+        Returns None when the change log no longer reaches back that far; the
+        caller has to treat every device as changed. IDs that are no longer
+        in the store were removed.
+        """
+        if revision < self._changelog_floor:
+            return None
+        changed: set[int] = set()
+        for entry_revision, device_id in reversed(self._changelog):
+            if entry_revision <= revision:
+                break
+            changed.add(device_id)
+        return changed
+
+    def mark_changed(self, device_ids: Iterable[int]) -> int:
+        """Record in-place changes to devices (e.g. optimistic writes), return the new revision."""
+        ids = [device_id for device_id in device_ids if device_id in self._devices]
+        if ids:
+            self._record(ids)
+        return self.revision
+
+    def _record(self, device_ids: Iterable[int]) -> None:
+        """Bump the revision and log the devices affected by one change."""
+        self.revision += 1
+        log = self._changelog
+        for device_id in device_ids:
+            self._revisions[device_id] = self.revision
+            if len(log) >= self._changelog_size:
+                self._changelog_floor = log.popleft()[0]
+            log.append((self.revision, device_id))
+
+    def changelog_stats(self) -> dict[str, int]:
+        """Return the change log state for diagnostics."""
+        return {
+            "revision": self.revision,
+            "entries": len(self._changelog),
+            "oldest_revision": self._changelog[0][0] if self._changelog else self.revision,
+            "floor": self._changelog_floor,
+        }
+
+    def by_type(self, *types: int) -> list[IPBuildingDevice]:
+        """Return the devices of the given type(s)."""
+        return [self._devices[i] for t in types for i in self._by_type.get(t, ())]
+
+    def by_type_kind(self, device_type: int, kind: int | None) -> list[IPBuildingDevice]:
+        """Return the devices of a type with a specific kind."""
+        return [self._devices[i] for i in self._by_type_kind.get((device_type, kind), ())]
+
+    def by_group(self, group: str | None) -> list[IPBuildingDevice]:
+        """Return the devices in a group (area)."""
+        return [self._devices[i] for i in self._by_group.get(group, ())]
+
+    def merge(
+        self,
+        devices: Iterable[IPBuildingDevice],
+        types: Iterable[int] | None = None,
+        partial: bool = False,
+    ) -> MergeResult:
+        """Merge fetched records in place and return what changed.
+
+        `types` are the types the fetch was authoritative for: devices of those
+        types that were not in the response have disappeared and are removed.
+        Pass None for a full fetch. An empty response removes nothing, so a
+        controller hiccup can't wipe the store.
+
+        With `partial`, the records only carry state fields (field projection):
+        they update existing records in place, and unknown devices are left
+        for the next full fetch.
+        """
+        result = MergeResult()
+        seen: set[int] = set()
+        for device in devices:
+            seen.add(device.id)
+            old = self._devices.get(device.id)
+            if partial:
+                if old is None:
+                    continue
+                if old.state_differs(device, partial=True):
+                    old.update_state(device)
+                    result.changed.add(device.id)
+                else:
+                    result.unchanged += 1
+                continue
+            if old is None:
+                self._add(device)
+                result.added.add(device.id)
+                result.changed.add(device.id)
+                continue
+            if old.type != device.type or old.kind != device.kind or old.group != device.group:
+                self._unindex(old)
+                self._index(device)
+            self._devices[device.id] = device
+            if old.state_differs(device):
+                result.changed.add(device.id)
+            else:
+                result.unchanged += 1
+
+        if seen:
+            candidates = (
+                self._devices
+                if types is None
+                else [i for t in types for i in self._by_type.get(t, ())]
+            )
+            for device_id in [i for i in candidates if i not in seen]:
+                self._remove(device_id)
+                result.removed.add(device_id)
+
+        if result.changed or result.removed:
+            self._record(result.changed | result.removed)
+        result.revision = self.revision
+        return result
+
+    def remove(self, device_id: int) -> IPBuildingDevice | None:
+        """Remove a device and drop it from every index."""
+        device = self._remove(device_id)
+        if device is not None:
+            self._record((device_id,))
+        return device
+
+    def _remove(self, device_id: int) -> IPBuildingDevice | None:
+        device = self._devices.pop(device_id, None)
+        if device is not None:
+            self._unindex(device)
+            self._revisions.pop(device_id, None)
+        return device
+
+    def _add(self, device: IPBuildingDevice) -> None:
+        self._devices[device.id] = device
+        self._index(device)
+
+    def _index(self, device: IPBuildingDevice) -> None:
+        self._by_type.setdefault(device.type, {})[device.id] = None
+        self._by_type_kind.setdefault((device.type, device.kind), {})[device.id] = None
+        self._by_group.setdefault(device.group, {})[device.id] = None
+
+    def _unindex(self, device: IPBuildingDevice) -> None:
+        for index, key in (
+            (self._by_type, device.type),
+            (self._by_type_kind, (device.type, device.kind)),
+            (self._by_group, device.group),
+        ):
+            bucket = index.get(key)
+            if bucket is None:
+                continue
+            bucket.pop(device.id, None)
+            if not bucket:
+                del index[key]
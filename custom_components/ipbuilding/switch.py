@@ -4,12 +4,14 @@ from typing import Any
 
 from homeassistant.components.switch import SwitchEntity
 from homeassistant.config_entries import ConfigEntry
-from homeassistant.core import HomeAssistant
+from homeassistant.core import HomeAssistant, callback
 from homeassistant.helpers.entity_platform import AddEntitiesCallback
-from homeassistant.helpers.update_coordinator import CoordinatorEntity, DataUpdateCoordinator
 
-from .const import DOMAIN, TYPE_RELAY
+from .const import DOMAIN, TYPE_RELAY, KIND_LIGHT, KIND_SOCKET, KIND_LOCK, KIND_FAN, KIND_VALVE
 from .api import IPBuildingAPI
+from .coordinator import IPBuildingCoordinator
+from .entity import IPBuildingEntity
+from .models import IPBuildingDevice
 
 _LOGGER = logging.getLogger(__name__)
 
@@ -21,50 +23,46 @@ async def async_setup_entry(
     """Set up the IPBuilding switch platform."""
     data = hass.data[DOMAIN][entry.entry_id]
     api: IPBuildingAPI = data["api"]
-    coordinator: DataUpdateCoordinator = data["coordinator"]
+    coordinator: IPBuildingCoordinator = data["coordinator"]
 
-    # Iterate coordinator data
-    entities = []
-    if coordinator.data:
-        from .const import TYPE_RELAY
-        for dev_id, device in coordinator.data.items():
-            if int(device.get("Type") or 0) == TYPE_RELAY:
-                # Skip Kind 1 (Light) - handled in light.py
-                if device.get("Kind") == 1:
-                    continue
-                entities.append(IPBuildingSwitch(coordinator, api, device))
+    @callback
+    def async_add_devices(devices: list[IPBuildingDevice]) -> None:
+        """Add switches for Relays, except Kind 1 (Light) which light.py handles."""
+        async_add_entities(
+            IPBuildingSwitch(coordinator, api, device)
+            for device in devices
+            if device.type == TYPE_RELAY and device.kind != KIND_LIGHT
+        )
 
-    async_add_entities(entities)
+    # Relays from the coordinator's type index, then whatever appears later
+    async_add_devices(coordinator.data.by_type(TYPE_RELAY))
+    entry.async_on_unload(coordinator.async_add_device_listener(async_add_devices))
 
 
-class IPBuildingSwitch(CoordinatorEntity, SwitchEntity):
+class IPBuildingSwitch(IPBuildingEntity, SwitchEntity):
     """Representation of an IPBuilding Switch (Relay)."""
-        
-    _attr_has_entity_name = True
 
-    def __init__(self, coordinator: DataUpdateCoordinator, api: IPBuildingAPI, device: dict) -> None:
+    def __init__(self, coordinator: IPBuildingCoordinator, api: IPBuildingAPI, device: IPBuildingDevice) -> None:
         """Initialize the switch."""
-        super().__init__(coordinator)
-        self._api = api
-        self._device_id = device.get("ID") or device.get("id")
-        self._initial_device_data = device
-        
-        self._attr_unique_id = f"ipbuilding_relay_{self._device_id}"
-        self._attr_name = device.get("Description") or device.get("name") or f"Relay {self._device_id}"
+        super().__init__(coordinator, api, device)
+        self._is_on = False
+
+        self._attr_unique_id = self._unique_id("relay")
+        self._attr_name = device.description or f"Relay {self._device_id}"
         
         # Default to disabled in registry, but enabled in HA logic
         #self._attr_entity_registry_enabled_default = False
         
         # Handle Kind
-        kind = device.get("Kind")
-        if kind == 2: # Socket
+        kind = device.kind
+        if kind == KIND_SOCKET:
             self._attr_device_class = "outlet"
             self._attr_icon = "mdi:power-socket-eu"
-        elif kind == 4: # Lock
+        elif kind == KIND_LOCK:
             self._attr_icon = "mdi:lock"
-        elif kind == 5: # Fan
+        elif kind == KIND_FAN:
             self._attr_icon = "mdi:fan"
-        elif kind == 6: # Valve
+        elif kind == KIND_VALVE:
             self._attr_icon = "mdi:valve"
         elif kind == 52: # Detector (Smoke?) - Check if this is correct mapping or if it needs to be specific
              # User requested smoke detector icon. Assuming Kind 52 might be detector or specific device.
@@ -76,66 +74,22 @@ class IPBuildingSwitch(CoordinatorEntity, SwitchEntity):
         # Check for smoke detector in description or kind if applicable
         if "smoke" in self._attr_name.lower() or "rook" in self._attr_name.lower():
              self._attr_icon = "mdi:smoke-detector-variant"
-        
-        # Device Info
-        self._attr_device_info = {
-            "identifiers": {(DOMAIN, f"output_{self._device_id}")},
-            "name": self._attr_name,
-            "manufacturer": "IPBuilding",
-            "model": "Relay",
-            "via_device": (DOMAIN, "hub_relays"),
-        }
-        if group := device.get("Group"):
-            self._attr_device_info["suggested_area"] = group.get("Name")
 
-    @property
-    def _device_data(self) -> dict:
-        """Get the latest device data from coordinator."""
-        return self.coordinator.data.get(self._device_id, self._initial_device_data)
-
-    @property
-    def available(self) -> bool:
-        """Return if entity is available."""
-        # Use Visible property from API, default to True
-        return self.coordinator.last_update_success and self._device_data.get("Visible", True)
-
-    @property
-    def extra_state_attributes(self) -> dict[str, Any]:
-        """Return the state attributes."""
-        d = self._device_data
-        return {
-            "IpAddress": d.get("IpAddress"),
-            "Port": d.get("Port"),
-            "Protocol": d.get("Protocol"),
-            "ID": self._device_id,
-            "Status": d.get("Status"),
-            "Output": d.get("Output"),
-            "Kind": d.get("Kind"),
-        }
+    def _update_attrs(self, d: IPBuildingDevice) -> None:
+        """Compute on/off."""
+        super()._update_attrs(d)
+        self._is_on = d.is_on
 
     @property
     def is_on(self) -> bool:
         """Return true if switch is on."""
-        d = self._device_data
-        val = d.get("Status") or d.get("status") or d.get("Value") or d.get("value")
-        if isinstance(val, bool):
-            return val
-        return int(val or 0) > 0
+        return self._is_on
 
     async def async_turn_on(self, **kwargs: Any) -> None:
         """Turn the switch on."""
-        # Optimistic update: immediately update local state
-        self.coordinator.data[self._device_id]["Value"] = 1
-        self.coordinator.data[self._device_id]["Status"] = 1
-        self.async_write_ha_state()
-        
-        await self._api.set_value(self._device_id, 1, "ON")
+        # Optimistic update, rolled back if the command fails
+        await self.coordinator.async_send_command(self._device_id, 1, "ON")
 
     async def async_turn_off(self, **kwargs: Any) -> None:
         """Turn the switch off."""
-        # Optimistic update: immediately update local state
-        self.coordinator.data[self._device_id]["Value"] = 0
-        self.coordinator.data[self._device_id]["Status"] = 0
-        self.async_write_ha_state()
-        
-        await self._api.set_value(self._device_id, 0, "OFF")
+        await self.coordinator.async_send_command(self._device_id, 0, "OFF")
@@ -0,0 +1,118 @@
+"""Push transports for IPBuilding state changes."""
+from __future__ import annotations
+
+import asyncio
+import logging
+from abc import ABC, abstractmethod
+from collections.abc import Callable
+from typing import TYPE_CHECKING, Any
+
+from .api import IPBuildingAPI
+from .const import PUSH_RECONNECT_MIN, PUSH_RECONNECT_MAX
+from .models import IPBuildingDevice
+
+if TYPE_CHECKING:
+    from .coordinator import IPBuildingCoordinator
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class EventTransport(ABC):
+    """A long-lived channel that delivers changed controller items.
+
+    Subclasses implement async_listen: connect, call `on_connected` once the
+    channel is up, pass every batch of raw items to `on_items`, and return
+    when the server ends the channel or raise when it fails.
+    """
+
+    name = "event"
+
+    @abstractmethod
+    async def async_listen(
+        self,
+        on_connected: Callable[[], None],
+        on_items: Callable[[list[Any]], None],
+    ) -> None:
+        """Listen for changes until the channel ends."""
+
+
+class HTTPStreamTransport(EventTransport):
+    """Changes streamed over a long-lived (long-poll) HTTP GET.
+
+    The response body is a JSON array or newline-delimited items, written by
+    the controller as devices change. A response that ends normally, as with
+    long-polling, is simply requested again.
+    """
+
+    name = "http_stream"
+
+    def __init__(self, api: IPBuildingAPI, path: str) -> None:
+        """Initialize the transport."""
+        self._api = api
+        self._path = path
+
+    async def async_listen(
+        self,
+        on_connected: Callable[[], None],
+        on_items: Callable[[list[Any]], None],
+    ) -> None:
+        """Stream items from the events endpoint."""
+        await self._api.async_listen_events(self._path, on_connected, on_items)
+
+
+class PushSupervisor:
+    """Keeps a push transport connected and feeds its changes to the coordinator.
+
+    While the channel is up the coordinator only polls at its idle ceiling as
+    a safety net. When the channel drops, the coordinator falls back to
+    adaptive polling and the supervisor reconnects with exponential backoff.
+    """
+
+    def __init__(self, coordinator: IPBuildingCoordinator, transport: EventTransport) -> None:
+        """Initialize the supervisor."""
+        self._coordinator = coordinator
+        self._transport = transport
+        self._backoff = PUSH_RECONNECT_MIN
+        self.events_received = 0
+        self.reconnects = 0
+
+    async def async_run(self) -> None:
+        """Run the transport forever (until cancelled on unload)."""
+        try:
+            while True:
+                try:
+                    await self._transport.async_listen(self._on_connected, self._on_items)
+                except asyncio.CancelledError:
+                    raise
+                except Exception as err:
+                    if self._coordinator.push_active:
+                        _LOGGER.warning(
+                            "IPBuilding %s push channel dropped, falling back to polling: %s",
+                            self._transport.name,
+                            err,
+                        )
+                    else:
+                        _LOGGER.debug("IPBuilding push channel unavailable: %s", err)
+                    self._coordinator.async_set_push_active(False)
+                    await asyncio.sleep(self._backoff)
+                    self._backoff = min(self._backoff * 2, PUSH_RECONNECT_MAX)
+                else:
+                    # Server ended the response (long-poll): ask again, staying in push mode
+                    await asyncio.sleep(PUSH_RECONNECT_MIN)
+                self.reconnects += 1
+        finally:
+            self._coordinator.async_set_push_active(False)
+
+    def _on_connected(self) -> None:
+        self._backoff = PUSH_RECONNECT_MIN
+        self._coordinator.async_set_push_active(True)
+
+    def _on_items(self, items: list[Any]) -> None:
+        devices = [
+            device
+            for item in items
+            if isinstance(item, dict) and (device := IPBuildingDevice.from_dict(item)) is not None
+        ]
+        self.events_received += len(devices)
+        if devices:
+            self._coordinator.async_apply_push(devices)
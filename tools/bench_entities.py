@@ -0,0 +1,175 @@
+"""Micro-benchmark the per-write CPU cost of the IPBuilding entities.
+
+Usage:
+    python tools/bench_entities.py [--entities 5000] [--rounds 20]
+
+Needs Home Assistant installed (the dev venv from DEVELOPMENT.md). Creates
+lights, switches and power sensors for fake dimmers and relays and times, per
+entity and round:
+
+- update: the coordinator-update hook after a device changed, including the
+  state calculation Home Assistant does on the write that follows
+- write: the state calculation alone, as for a write without a new update
+- fan-out: the coordinator-update hook again without any change, as for the
+  full fan-out when an outage starts or ends
+
+No network or state machine is involved: async_write_ha_state only runs
+Home Assistant's own state and attribute calculation. Run it on two
+revisions to compare them. Before timing, it checks that creating, disabling,
+enabling and removing an entity in the entity registry changes the types
+the coordinator fast-polls.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+from types import MappingProxyType
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from homeassistant.config_entries import SOURCE_USER, ConfigEntry  # noqa: E402
+from homeassistant.core import HomeAssistant  # noqa: E402
+from homeassistant.helpers import entity_registry as er  # noqa: E402
+
+from custom_components.ipbuilding.api import IPBuildingAPI  # noqa: E402
+from custom_components.ipbuilding.const import DOMAIN, KIND_LIGHT, TYPE_DIMMER, TYPE_RELAY  # noqa: E402
+from custom_components.ipbuilding.coordinator import IPBuildingCoordinator  # noqa: E402
+from custom_components.ipbuilding.light import IPBuildingLight  # noqa: E402
+from custom_components.ipbuilding.models import IPBuildingDevice  # noqa: E402
+from custom_components.ipbuilding.sensor import IPBuildingPowerSensor  # noqa: E402
+from custom_components.ipbuilding.store import DeviceStore  # noqa: E402
+from custom_components.ipbuilding.switch import IPBuildingSwitch  # noqa: E402
+from fake_controller import FakeController  # noqa: E402
+
+
+def calculating(cls: type) -> type:
+    """Subclass an entity class so a state write only calculates the state."""
+
+    def async_write_ha_state(self) -> None:
+        self._async_calculate_state()
+
+    return type(f"Calculating{cls.__name__}", (cls,), {"async_write_ha_state": async_write_ha_state})
+
+
+def build_entities(coordinator: IPBuildingCoordinator, api: IPBuildingAPI) -> list:
+    """Create a light or switch plus a power sensor for every device."""
+    light, switch, power = (calculating(c) for c in (IPBuildingLight, IPBuildingSwitch, IPBuildingPowerSensor))
+    entities = []
+    for device in coordinator.data.values():
+        if device.type == TYPE_DIMMER or device.kind == KIND_LIGHT:
+            entities.append(light(coordinator, api, device))
+        else:
+            entities.append(switch(coordinator, api, device))
+        entities.append(power(coordinator, api, device))
+    for entity in entities:
+        entity.hass = coordinator.hass
+        entity.entity_id = f"bench.ipbuilding_{id(entity)}"
+    return entities
+
+
+def time_round(entities: list, func_name: str) -> float:
+    """Call a method of every entity, return the elapsed CPU seconds."""
+    start = time.process_time()
+    for entity in entities:
+        getattr(entity, func_name)()
+    return time.process_time() - start
+
+
+async def check_poll_types(hass: HomeAssistant, api: IPBuildingAPI, devices: list[IPBuildingDevice]) -> None:
+    """Check that entity registry changes of the entry rebuild coordinator.poll_types."""
+    entry = ConfigEntry(
+        data={},
+        discovery_keys=MappingProxyType({}),
+        domain=DOMAIN,
+        minor_version=1,
+        options={},
+        source=SOURCE_USER,
+        title="bench",
+        unique_id=None,
+        version=2,
+    )
+    await er.async_load(hass)
+    ent_reg = er.async_get(hass)
+    coordinator = IPBuildingCoordinator(hass, api, config_entry=entry)
+    coordinator.async_set_updated_data(DeviceStore(devices))
+    coordinator._poll_types_rebuild.cooldown = 0.01
+    stop = coordinator.async_track_enabled_entities()
+
+    async def expect(types: list[int], step: str) -> None:
+        await asyncio.sleep(0.05)
+        await hass.async_block_till_done()
+        assert coordinator.poll_types == types, (step, coordinator.poll_types)
+
+    dimmer = next(device for device in devices if device.type == TYPE_DIMMER)
+    await expect([], "no entities")
+    entity_id = ent_reg.async_get_or_create(
+        "light", DOMAIN, f"{entry.entry_id}_dimmer_{dimmer.id}", config_entry=entry
+    ).entity_id
+    await expect([TYPE_DIMMER], "created")
+    ent_reg.async_update_entity(entity_id, disabled_by=er.RegistryEntryDisabler.USER)
+    await expect([], "disabled")
+    ent_reg.async_update_entity(entity_id, disabled_by=None)
+    await expect([TYPE_DIMMER], "enabled")
+    ent_reg.async_remove(entity_id)
+    await expect([], "removed")
+    stop()
+
+
+async def run(args: argparse.Namespace) -> dict[str, float]:
+    """Time the update hook and the state calculation, return µs per write."""
+    controller = FakeController(args.entities // 2)
+    for raw in controller.devices.values():
+        raw["Type"] = TYPE_DIMMER if raw["ID"] % 2 else TYPE_RELAY
+        raw["Watt"] = controller.rng.choice([5, 10, 60])
+    devices = [IPBuildingDevice.from_dict(raw) for raw in controller.devices.values()]
+
+    hass = HomeAssistant(tempfile.mkdtemp(prefix="ipbuilding_bench_"))
+    api = IPBuildingAPI("127.0.0.1", 1)
+    try:
+        await check_poll_types(hass, api, devices)
+        coordinator = IPBuildingCoordinator(hass, api)
+        coordinator.async_set_updated_data(DeviceStore(devices))
+        entities = build_entities(coordinator, api)
+        # Initial state, as when the entities are added
+        time_round(entities, "_handle_coordinator_update")
+
+        update = write = fan_out = 0.0
+        for i in range(args.rounds):
+            for device in coordinator.data.values():
+                device.set_level((device.id + i) % 101 if device.type == TYPE_DIMMER else i % 2)
+            update += time_round(entities, "_handle_coordinator_update")
+            write += time_round(entities, "async_write_ha_state")
+            fan_out += time_round(entities, "_handle_coordinator_update")
+
+        writes = len(entities) * args.rounds
+        return {
+            "entities": len(entities),
+            "update_us": update / writes * 1e6,
+            "write_us": write / writes * 1e6,
+            "fan_out_us": fan_out / writes * 1e6,
+        }
+    finally:
+        await api.async_close()
+        await hass.async_stop(force=True)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--entities", type=int, default=5000)
+    parser.add_argument("--rounds", type=int, default=20)
+    args = parser.parse_args()
+
+    result = asyncio.run(run(args))
+
+    print(f"{result['entities']} entities, {args.rounds} rounds (CPU time per entity write)")
+    print(f"update + write: {result['update_us']:8.1f} µs  ({result['update_us'] * result['entities'] / 1000:.1f} ms per refresh)")
+    print(f"write only:     {result['write_us']:8.1f} µs  ({result['write_us'] * result['entities'] / 1000:.1f} ms per refresh)")
+    print(f"fan-out:        {result['fan_out_us']:8.1f} µs  ({result['fan_out_us'] * result['entities'] / 1000:.1f} ms per refresh)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+"""Benchmark comp/items parsing: whole-payload json.loads vs the streaming parser.
+
+Usage:
+    python tools/bench_parse.py [--devices 5000] [--chunk 65536]
+
+Both paths produce the same normalized records for the fast-poll types; the
+report shows parse time and tracemalloc peak memory for each. Before timing,
+the streaming parser is checked against json.loads with tiny chunk sizes, so
+items (and bare numbers) cut at every possible chunk boundary are covered,
+and a Status-only push event is checked to keep the fields it leaves out.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+# jsonstream and models have no Home Assistant imports, load them directly
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "custom_components", "ipbuilding"))
+
+from jsonstream import JSONItemStream  # noqa: E402
+from models import IPBuildingDevice  # noqa: E402
+
+FAST_POLL_TYPES = {1, 2, 3, 60}
+ALL_TYPES = [1, 2, 3, 40, 41, 50, 51, 52, 53, 56, 60, 100, 101, 102, 150, 200]
+
+
+def make_payload(count: int) -> bytes:
+    """Build a comp/items-like payload with `count` items."""
+    rng = random.Random(42)
+    items = []
+    for i in range(count):
+        dtype = rng.choice(ALL_TYPES)
+        items.append({
+            "__type": "Relais:IPBuilding",
+            "ID": i + 1,
+            "Type": dtype,
+            "Kind": rng.randint(1, 8),
+            "Description": f"Device {i + 1} [30.1.{i % 64}]",
+            "Group": {"ID": i % 40, "Name": f"Room {i % 40}"},
+            "IpAddress": f"10.10.1.{i % 250}",
+            "Port": 1001,
+            "Protocol": 0,
+            "Visible": True,
+            "MobileIcon": 0,
+            "MobileVisible": True,
+            "Output": i % 16,
+            "Status": rng.randint(0, 100) if dtype == 2 else rng.randint(0, 1),
+            "Watt": rng.choice([0, 5, 10, 60]),
+        })
+    return json.dumps(items).encode()
+
+
+def parse_whole(payload: bytes) -> list[IPBuildingDevice]:
+    """The previous path: decode everything, then filter and normalize."""
+    data = json.loads(payload)
+    filtered = [d for d in data if int(d.get("Type") or 0) in FAST_POLL_TYPES]
+    return [IPBuildingDevice.from_dict(d) for d in filtered]
+
+
+def parse_stream(payload: bytes, chunk_size: int) -> list[IPBuildingDevice]:
+    """The streaming path used by IPBuildingAPI.get_devices."""
+    stream = JSONItemStream()
+    devices = []
+    for start in range(0, len(payload), chunk_size):
+        for item, _size in stream.feed(payload[start:start + chunk_size]):
+            if int(item.get("Type") or 0) in FAST_POLL_TYPES:
+                devices.append(IPBuildingDevice.from_dict(item))
+    for item, _size in stream.close():
+        if int(item.get("Type") or 0) in FAST_POLL_TYPES:
+            devices.append(IPBuildingDevice.from_dict(item))
+    return devices
+
+
+def check_chunk_boundaries() -> None:
+    """Feed payloads in 1 to 7 byte chunks and compare with json.loads."""
+    payloads = [
+        b"[1,2,1234,-5.5e3,true,null]",
+        b'[ {"ID": 1, "Status": 12}, "x,]", [3, 4] , 99 ]',
+        make_payload(20),
+    ]
+    for payload in payloads:
+        for chunk_size in range(1, 8):
+            stream = JSONItemStream()
+            items = []
+            for start in range(0, len(payload), chunk_size):
+                items.extend(item for item, _size in stream.feed(payload[start:start + chunk_size]))
+            items.extend(item for item, _size in stream.close())
+            assert items == json.loads(payload), f"chunk size {chunk_size}: {items!r}"
+    print("chunk boundaries: ok")
+
+
+def check_partial_update() -> None:
+    """Apply a Status-only event, as the push channel sends, to a full record."""
+    device = IPBuildingDevice.from_dict(
+        {"ID": 7, "Type": 2, "Status": 10, "Value": 10, "Visible": True, "Watt": 60}
+    )
+    event = IPBuildingDevice.from_dict({"ID": 7, "Type": 2, "Status": 50, "Visible": True})
+    assert device.state_differs(event, partial=True)
+    device.update_state(event)
+    assert (device.status, device.value, device.level, device.watt) == (50, 10, 50, 60.0), device
+    print("partial update: ok")
+
+
+def measure(name: str, func, *args) -> list[IPBuildingDevice]:
+    """Run func once for timing and once under tracemalloc for peak memory."""
+    start = time.perf_counter()
+    result = func(*args)
+    elapsed = time.perf_counter() - start
+
+    tracemalloc.start()
+    func(*args)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    print(f"{name:<8} {elapsed * 1000:9.1f} ms  peak {peak / 1024 / 1024:8.2f} MiB  {len(result)} records")
+    return result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--devices", type=int, default=5000)
+    parser.add_argument("--chunk", type=int, default=65536)
+    args = parser.parse_args()
+
+    check_chunk_boundaries()
+    check_partial_update()
+    payload = make_payload(args.devices)
+    print(f"payload: {args.devices} items, {len(payload) / 1024 / 1024:.2f} MiB")
+    whole = measure("whole", parse_whole, payload)
+    stream = measure("stream", parse_stream, payload, args.chunk)
+    assert whole == stream, "streaming parser produced different records"
+
+
+if __name__ == "__main__":
+    main()
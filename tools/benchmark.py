@@ -0,0 +1,316 @@
+"""Benchmark the integration against the local fake controller.
+
+Usage:
+    python tools/benchmark.py [--devices 5000] [--polls 50] [--changes 20]
+        [--commands 500] [--concurrency 8] [--latency 5] [--jitter 2]
+        [--error-rate 0] [--json results.json]
+
+Needs Home Assistant installed (the dev venv from DEVELOPMENT.md). Starts
+tools/fake_controller.py in-process and drives the real IPBuildingAPI,
+IPBuildingCoordinator and light/switch/sensor entities against it:
+
+- full fetch: get_devices() of every item
+- poll: coordinator refreshes with `--changes` devices changed in between,
+  including the store merge and the entity fan-out
+- merge: DeviceStore.merge of a full fetch on its own
+- set_value: `--commands` command round trips, `--concurrency` at a time
+
+Each phase reports throughput, p50/p99 latency and tracemalloc peak memory
+(measured in a separate pass, so it doesn't skew the timings). For the polls
+it also reports the attribute bytes and distinct attribute rows the recorder
+would store, with and without the unrecorded static attributes.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from collections.abc import Awaitable, Callable
+from typing import Any
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from aiohttp import web  # noqa: E402
+from homeassistant.core import HomeAssistant  # noqa: E402
+
+from custom_components.ipbuilding.api import IPBuildingAPI  # noqa: E402
+from custom_components.ipbuilding.const import KIND_LIGHT, TYPE_DIMMER, TYPE_RELAY  # noqa: E402
+from custom_components.ipbuilding.coordinator import IPBuildingCoordinator  # noqa: E402
+from custom_components.ipbuilding.light import IPBuildingLight  # noqa: E402
+from custom_components.ipbuilding.sensor import IPBuildingPowerSensor  # noqa: E402
+from custom_components.ipbuilding.store import DeviceStore  # noqa: E402
+from custom_components.ipbuilding.switch import IPBuildingSwitch  # noqa: E402
+from fake_controller import create_app  # noqa: E402
+
+
+def percentile(samples: list[float], pct: float) -> float:
+    """Nearest-rank percentile of samples (seconds)."""
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+class EntityWrites:
+    """Counts state writes of the benchmark entities and what the recorder would store."""
+
+    def __init__(self) -> None:
+        """Initialize the counters."""
+        self.count = 0
+        # Attribute JSON bytes with every attribute vs without the unrecorded ones
+        self.attribute_bytes = 0
+        self.recorded_bytes = 0
+        # The recorder stores each distinct attribute set once
+        self.attribute_rows: set[str] = set()
+        self.recorded_rows: set[str] = set()
+
+    def reset(self) -> None:
+        """Start counting again."""
+        self.__init__()
+
+
+def counting(cls: type, writes: EntityWrites) -> type:
+    """Subclass an entity class so state writes are counted instead of hitting the state machine.
+
+    The write still evaluates what Home Assistant would: availability, state
+    and attributes.
+    """
+
+    def async_write_ha_state(self) -> None:
+        writes.count += 1
+        if not self.available:
+            return
+        self.state  # noqa: B018
+        attributes = self.extra_state_attributes or {}
+        everything = json.dumps(attributes, sort_keys=True, default=str)
+        recorded = json.dumps(
+            {k: v for k, v in attributes.items() if k not in self._unrecorded_attributes},
+            sort_keys=True,
+            default=str,
+        )
+        writes.attribute_bytes += len(everything)
+        writes.recorded_bytes += len(recorded)
+        writes.attribute_rows.add(everything)
+        writes.recorded_rows.add(recorded)
+
+    return type(f"Counting{cls.__name__}", (cls,), {"async_write_ha_state": async_write_ha_state})
+
+
+def build_entities(coordinator: IPBuildingCoordinator, api: IPBuildingAPI, writes: EntityWrites) -> list:
+    """Create the entities the platforms would and subscribe them to the coordinator."""
+    store = coordinator.data
+    light, switch, power = (counting(c, writes) for c in (IPBuildingLight, IPBuildingSwitch, IPBuildingPowerSensor))
+    entities = [light(coordinator, api, d) for d in store.by_type(TYPE_DIMMER) + store.by_type_kind(TYPE_RELAY, KIND_LIGHT)]
+    entities += [switch(coordinator, api, d) for d in store.by_type(TYPE_RELAY) if d.kind != KIND_LIGHT]
+    entities += [power(coordinator, api, d) for d in store.by_type(TYPE_RELAY, TYPE_DIMMER) if d.watt is not None]
+    for entity in entities:
+        entity.hass = coordinator.hass
+        entity.entity_id = f"bench.ipbuilding_{id(entity)}"
+        entity.async_on_remove(
+            coordinator.async_add_listener(entity._handle_coordinator_update, entity.coordinator_context)
+        )
+    return entities
+
+
+async def timed(func: Callable[[], Awaitable[Any]], runs: int) -> tuple[list[float], int]:
+    """Await func `runs` times, returning the latencies and the error count."""
+    latencies = []
+    errors = 0
+    for _ in range(runs):
+        start = time.perf_counter()
+        try:
+            await func()
+        except Exception:
+            errors += 1
+        latencies.append(time.perf_counter() - start)
+    return latencies, errors
+
+
+async def peak_memory(func: Callable[[], Awaitable[Any]]) -> int:
+    """Run func once under tracemalloc and return the peak in bytes."""
+    tracemalloc.start()
+    try:
+        await func()
+    except Exception:
+        pass
+    _current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak
+
+
+def result(name: str, latencies: list[float], errors: int, ops: int, peak: int, **extra: Any) -> dict[str, Any]:
+    """Summarize a phase."""
+    total = sum(latencies)
+    return {
+        "phase": name,
+        "runs": len(latencies),
+        "errors": errors,
+        "ops_per_s": ops / total if total else 0.0,
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+        "peak_kib": peak / 1024,
+        **extra,
+    }
+
+
+async def run(args: argparse.Namespace) -> list[dict[str, Any]]:
+    """Run every phase and return the results."""
+    app = create_app(args.devices, args.latency, args.jitter, args.error_rate, event_interval=None)
+    controller = app["controller"]
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+
+    config_dir = tempfile.mkdtemp(prefix="ipbuilding_bench_")
+    hass = HomeAssistant(config_dir)
+    api = IPBuildingAPI("127.0.0.1", port)
+    results = []
+    try:
+        # Full fetch
+        latencies, errors = await timed(api.get_devices, args.fetches)
+        peak = await peak_memory(api.get_devices)
+        results.append(result("full fetch", latencies, errors, args.devices * len(latencies), peak, unit="items"))
+
+        for attempt in range(5):
+            try:
+                devices = await api.get_devices()
+                break
+            except Exception:
+                if attempt == 4:
+                    raise
+        coordinator = IPBuildingCoordinator(hass, api)
+        coordinator.async_set_updated_data(DeviceStore(devices))
+        writes = EntityWrites()
+        entities = build_entities(coordinator, api, writes)
+
+        # Store merge on its own (no changes: the steady state)
+        def merge() -> None:
+            coordinator.data.merge(devices, None)
+
+        merge_latencies = []
+        for _ in range(args.polls):
+            start = time.perf_counter()
+            merge()
+            merge_latencies.append(time.perf_counter() - start)
+
+        async def merge_async() -> None:
+            merge()
+
+        peak = await peak_memory(merge_async)
+        results.append(result("merge", merge_latencies, 0, len(devices) * args.polls, peak, unit="items"))
+
+        # Polls with changes in between, including the entity fan-out
+        async def poll() -> None:
+            for _ in range(args.changes):
+                controller.random_change()
+            await coordinator.async_refresh()
+            if not coordinator.last_update_success:
+                raise RuntimeError("poll failed")
+
+        writes.reset()
+        latencies, errors = await timed(poll, args.polls)
+        fan_out = writes.count
+        recorder = {
+            "attribute_bytes": writes.attribute_bytes,
+            "recorded_bytes": writes.recorded_bytes,
+            "attribute_rows": len(writes.attribute_rows),
+            "recorded_rows": len(writes.recorded_rows),
+        }
+        peak = await peak_memory(poll)
+        results.append(
+            result(
+                "poll",
+                latencies,
+                errors,
+                len(latencies),
+                peak,
+                unit="polls",
+                entities=len(entities),
+                writes_per_poll=fan_out / max(len(latencies), 1),
+                recorder=recorder,
+            )
+        )
+
+        # Command round trips
+        targets = [d.id for d in coordinator.data.by_type(TYPE_RELAY, TYPE_DIMMER)] or list(coordinator.data)
+        semaphore = asyncio.Semaphore(args.concurrency)
+        command_latencies: list[float] = []
+        command_errors = 0
+
+        async def command(i: int) -> None:
+            nonlocal command_errors
+            async with semaphore:
+                start = time.perf_counter()
+                try:
+                    await api.set_value(targets[i % len(targets)], i % 2, "ON" if i % 2 else "OFF")
+                except Exception:
+                    command_errors += 1
+                command_latencies.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        await asyncio.gather(*(command(i) for i in range(args.commands)))
+        elapsed = time.perf_counter() - start
+        latencies, errors = list(command_latencies), command_errors
+        peak = await peak_memory(lambda: asyncio.gather(*(command(i) for i in range(args.concurrency))))
+        summary = result("set_value", latencies, errors, 0, peak, unit="commands")
+        summary["ops_per_s"] = args.commands / elapsed if elapsed else 0.0
+        summary["retried"] = api.commands_retried
+        results.append(summary)
+
+        for entity in entities:
+            await entity.async_remove()
+        await coordinator.async_shutdown()
+    finally:
+        await api.async_close()
+        await hass.async_stop(force=True)
+        await runner.cleanup()
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--devices", type=int, default=5000)
+    parser.add_argument("--fetches", type=int, default=20)
+    parser.add_argument("--polls", type=int, default=50)
+    parser.add_argument("--changes", type=int, default=20, help="devices changed between polls")
+    parser.add_argument("--commands", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--latency", type=float, default=5.0, help="controller ms per request")
+    parser.add_argument("--jitter", type=float, default=2.0, help="controller ± ms per request")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--json", help="also write the results to this file")
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args))
+
+    print(f"{args.devices} devices, {args.latency:g}±{args.jitter:g} ms latency, {args.error_rate:.0%} errors")
+    print(f"{'phase':<12}{'runs':>6}{'errors':>8}{'ops/s':>12}{'p50 ms':>10}{'p99 ms':>10}{'peak KiB':>11}")
+    for r in results:
+        print(
+            f"{r['phase']:<12}{r['runs']:>6}{r['errors']:>8}{r['ops_per_s']:>12.1f}"
+            f"{r['p50_ms']:>10.2f}{r['p99_ms']:>10.2f}{r['peak_kib']:>11.0f}"
+        )
+    for r in results:
+        if "writes_per_poll" in r:
+            print(f"poll fan-out: {r['writes_per_poll']:.1f} entity writes per poll across {r['entities']} entities")
+            rec = r["recorder"]
+            print(
+                f"recorder: {rec['recorded_bytes']} of {rec['attribute_bytes']} attribute bytes stored, "
+                f"{rec['recorded_rows']} distinct attribute rows (vs {rec['attribute_rows']} with every attribute)"
+            )
+        if "retried" in r:
+            print(f"set_value: {r['retried']} retries")
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as file:
+            json.dump(results, file, indent=2)
+
+
+if __name__ == "__main__":
+    main()
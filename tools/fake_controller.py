@@ -0,0 +1,215 @@
+"""Local stand-in for an IPBuilding controller.
+
+Usage:
+    python tools/fake_controller.py [--devices 200] [--port 8080]
+        [--latency 20] [--jitter 5] [--error-rate 0.01]
+        [--event-interval 2] [--drop-after 30]
+
+Serves the endpoints the integration uses:
+
+- `GET /api/v1/comp/items` (honors `types` and `fields`)
+- `GET /api/v1/action/action` (applies the value and emits a change event)
+- `GET /api/v1/comp/events`: newline-delimited change events, for the push
+  channel (set the integration's `push_path` option to `comp/events`)
+
+Every `--event-interval` seconds a random device changes. With `--drop-after`
+the events stream is cut after that many seconds, to exercise the fallback to
+polling and the reconnect.
+
+`--latency`/`--jitter` (ms) delay every items and action request, and
+`--error-rate` answers that fraction of them with a 500. tools/benchmark.py
+starts the same app in-process through create_app().
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import logging
+import random
+
+from aiohttp import web
+
+_LOGGER = logging.getLogger(__name__)
+
+ALL_TYPES = [1, 2, 3, 40, 41, 50, 51, 52, 53, 56, 60, 100, 101, 102, 150, 200]
+
+
+class FakeController:
+    """In-memory devices plus the listeners of the events stream."""
+
+    def __init__(self, count: int, seed: int = 42) -> None:
+        """Create `count` devices."""
+        self.rng = random.Random(seed)
+        self.devices: dict[int, dict] = {}
+        for i in range(count):
+            dtype = self.rng.choice(ALL_TYPES)
+            self.devices[i + 1] = {
+                "__type": "Relais:IPBuilding",
+                "ID": i + 1,
+                "Type": dtype,
+                "Kind": self.rng.randint(1, 8),
+                "Description": f"Device {i + 1} [30.1.{i % 64}]",
+                "Group": {"ID": i % 40, "Name": f"Room {i % 40}"},
+                "IpAddress": f"10.10.1.{i % 250}",
+                "Port": 1001,
+                "Protocol": 0,
+                "Visible": True,
+                "Output": i % 16,
+                "Status": 0,
+                "Watt": self.rng.choice([0, 5, 10, 60]),
+            }
+        self.listeners: set[asyncio.Queue] = set()
+
+    def set_status(self, device_id: int, value) -> dict | None:
+        """Change a device and notify the events listeners."""
+        device = self.devices.get(device_id)
+        if device is None:
+            return None
+        device["Status"] = value
+        event = {"ID": device_id, "Type": device["Type"], "Status": value, "Visible": device["Visible"]}
+        for queue in self.listeners:
+            queue.put_nowait(event)
+        return device
+
+    def random_change(self) -> None:
+        """Toggle or dim a random relay/dimmer."""
+        candidates = [d for d in self.devices.values() if d["Type"] in (1, 2)]
+        if not candidates:
+            return
+        device = self.rng.choice(candidates)
+        if device["Type"] == 2:
+            value = self.rng.randint(0, 100)
+        else:
+            value = 0 if device["Status"] else 1
+        self.set_status(device["ID"], value)
+
+
+@web.middleware
+async def simulate_network(request: web.Request, handler):
+    """Delay requests and fail a fraction of them, like a busy controller."""
+    app = request.app
+    if request.path.endswith("/comp/events"):
+        return await handler(request)
+    controller: FakeController = app["controller"]
+    delay = app["latency"] + controller.rng.uniform(-app["jitter"], app["jitter"])
+    if delay > 0:
+        await asyncio.sleep(delay / 1000)
+    if controller.rng.random() < app["error_rate"]:
+        raise web.HTTPInternalServerError()
+    return await handler(request)
+
+
+async def handle_items(request: web.Request) -> web.Response:
+    controller: FakeController = request.app["controller"]
+    items = list(controller.devices.values())
+    if types := request.query.get("types"):
+        wanted = {int(t) for t in types.split(",")}
+        items = [item for item in items if item["Type"] in wanted]
+    if fields := request.query.get("fields"):
+        wanted_fields = set(fields.split(",")) | {"__type"}
+        items = [{k: v for k, v in item.items() if k in wanted_fields} for item in items]
+    return web.json_response(items)
+
+
+async def handle_action(request: web.Request) -> web.Response:
+    controller: FakeController = request.app["controller"]
+    try:
+        device_id = int(request.query["id"])
+        value = int(request.query["value"])
+    except (KeyError, ValueError):
+        raise web.HTTPBadRequest()
+    if controller.set_status(device_id, value) is None:
+        raise web.HTTPNotFound()
+    return web.json_response({"ID": device_id, "Status": value})
+
+
+async def handle_events(request: web.Request) -> web.StreamResponse:
+    controller: FakeController = request.app["controller"]
+    drop_after: float | None = request.app["drop_after"]
+    response = web.StreamResponse(headers={"Content-Type": "application/x-ndjson"})
+    await response.prepare(request)
+    queue: asyncio.Queue = asyncio.Queue()
+    controller.listeners.add(queue)
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + drop_after if drop_after else None
+    try:
+        while True:
+            timeout = None if deadline is None else deadline - loop.time()
+            if timeout is not None and timeout <= 0:
+                _LOGGER.info("Dropping events stream")
+                # Cut the connection without finishing the response
+                request.transport.close()
+                break
+            try:
+                event = await asyncio.wait_for(queue.get(), timeout)
+            except asyncio.TimeoutError:
+                continue
+            await response.write(json.dumps(event).encode() + b"\n")
+    finally:
+        controller.listeners.discard(queue)
+    return response
+
+
+async def change_devices(app: web.Application) -> None:
+    while True:
+        await asyncio.sleep(app["event_interval"])
+        app["controller"].random_change()
+
+
+async def start_background(app: web.Application):
+    task = asyncio.create_task(change_devices(app))
+    yield
+    task.cancel()
+
+
+def create_app(
+    devices: int = 200,
+    latency: float = 0.0,
+    jitter: float = 0.0,
+    error_rate: float = 0.0,
+    event_interval: float | None = 2.0,
+    drop_after: float | None = None,
+    seed: int = 42,
+) -> web.Application:
+    """Build the fake controller app; no random changes when event_interval is None."""
+    app = web.Application(middlewares=[simulate_network])
+    app["controller"] = FakeController(devices, seed)
+    app["latency"] = latency
+    app["jitter"] = jitter
+    app["error_rate"] = error_rate
+    app["event_interval"] = event_interval
+    app["drop_after"] = drop_after
+    app.router.add_get("/api/v1/comp/items", handle_items)
+    app.router.add_get("/api/v1/action/action", handle_action)
+    app.router.add_get("/api/v1/comp/events", handle_events)
+    if event_interval:
+        app.cleanup_ctx.append(start_background)
+    return app
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--devices", type=int, default=200)
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--latency", type=float, default=0.0, help="ms per request")
+    parser.add_argument("--jitter", type=float, default=0.0, help="± ms per request")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction answered with a 500")
+    parser.add_argument("--event-interval", type=float, default=2.0)
+    parser.add_argument("--drop-after", type=float, default=None)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(message)s")
+
+    app = create_app(
+        args.devices,
+        args.latency,
+        args.jitter,
+        args.error_rate,
+        args.event_interval,
+        args.drop_after,
+    )
+    web.run_app(app, port=args.port, access_log=None)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,226 @@
+"""Serve a captured IPBuilding controller session back to the integration.
+
+Usage:
+    python tools/replay_server.py CAPTURE.jsonl.gz [--port 8080] [--speed 1]
+        [--start 0] [--sequential] [--no-latency]
+
+Replays a file written by the integration's `capture_traffic` option (see
+custom_components/ipbuilding/capture.py). Point the integration at the
+server (host `127.0.0.1`, the given port) like at tools/fake_controller.py.
+
+The replay clock starts with the first request, at `--start` seconds into
+the capture, and runs `--speed` times faster than real time. A request gets
+the answer recorded for the same path and query that was sent closest to
+the replay clock, so the controller state evolves as it did in the
+building, `--speed` times faster. With `--sequential`,
+each path and query instead gets its recorded answers in order (repeating
+the last), independent of timing.
+
+Answers are delayed by their recorded latency divided by `--speed`
+(`--no-latency` answers at once). Recorded errors are replayed: an HTTP
+status as that status, a timeout or connection error by closing the
+connection. A request without a recording for its exact query gets the
+closest answer for its path; the events stream replays the recorded chunks
+at their times. A summary of what was served is printed on exit. Scripts
+can start the same app in-process through create_app().
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import gzip
+import json
+from bisect import bisect_left
+from collections import Counter, defaultdict
+
+from aiohttp import web
+
+API_PREFIX = "/api/v1/"
+
+
+def _bytes(text: str) -> bytes:
+    """Return the exact bytes a captured body was recorded from."""
+    return text.encode("utf-8", "surrogateescape")
+
+
+def _key(path: str, params: dict[str, str]) -> tuple[str, tuple[tuple[str, str], ...]]:
+    return path, tuple(sorted(params.items()))
+
+
+def _closest(entries: list[dict], times: list[float], t: float) -> dict:
+    """Return the entry sent closest to capture time `t`."""
+    index = bisect_left(times, t)
+    if index == len(times) or (index and t - times[index - 1] <= times[index] - t):
+        index -= 1
+    return entries[index]
+
+
+class Capture:
+    """The answers and stream chunks of a capture, indexed for lookup."""
+
+    def __init__(self, filename: str) -> None:
+        """Load a capture file."""
+        self.header: dict = {}
+        self.answers: dict[tuple, list[dict]] = defaultdict(list)
+        self.by_path: dict[str, list[dict]] = defaultdict(list)
+        self.chunks: dict[str, list[dict]] = defaultdict(list)
+        with gzip.open(filename, "rt", encoding="utf-8") as file:
+            for line in file:
+                if not line.strip():
+                    continue
+                entry = json.loads(line)
+                if "capture" in entry:
+                    self.header = entry
+                elif "chunk" in entry:
+                    self.chunks[entry["path"]].append(entry)
+                else:
+                    self.answers[_key(entry["path"], entry.get("params", {}))].append(entry)
+                    self.by_path[entry["path"]].append(entry)
+        # Lines are written when a request finished: order by when it was sent
+        for entries in (*self.answers.values(), *self.by_path.values(), *self.chunks.values()):
+            entries.sort(key=lambda entry: entry["t"])
+        self.times = {key: [entry["t"] for entry in entries] for key, entries in self.answers.items()}
+        self.path_times = {path: [entry["t"] for entry in entries] for path, entries in self.by_path.items()}
+        self.duration = max(
+            (entries[-1]["t"] for entries in (*self.by_path.values(), *self.chunks.values()) if entries),
+            default=0.0,
+        )
+
+
+class Replay:
+    """Replay clock plus the per-query position of sequential replay."""
+
+    def __init__(self, capture: Capture, speed: float, start: float, sequential: bool) -> None:
+        """Start the clock."""
+        self.capture = capture
+        self.speed = speed
+        self.start = start
+        self.sequential = sequential
+        self._loop = asyncio.get_running_loop()
+        self._began: float | None = None
+        self._positions: Counter = Counter()
+        self.stats: Counter = Counter()
+
+    def now(self) -> float:
+        """Seconds into the capture, the clock starts on the first call."""
+        if self._began is None:
+            self._began = self._loop.time()
+        return self.start + (self._loop.time() - self._began) * self.speed
+
+    async def sleep_until(self, t: float) -> None:
+        """Wait until the replay clock reaches capture time `t`."""
+        if (delay := (t - self.now()) / self.speed) > 0:
+            await asyncio.sleep(delay)
+
+    def answer(self, path: str, params: dict[str, str]) -> dict | None:
+        """Pick the recorded answer for a request."""
+        key = _key(path, params)
+        if (entries := self.capture.answers.get(key)) is not None:
+            self.stats["exact"] += 1
+            if self.sequential:
+                index = min(self._positions[key], len(entries) - 1)
+                self._positions[key] += 1
+                return entries[index]
+            return _closest(entries, self.capture.times[key], self.now())
+        if (entries := self.capture.by_path.get(path)) is not None:
+            self.stats["path_only"] += 1
+            return _closest(entries, self.capture.path_times[path], self.now())
+        self.stats["missing"] += 1
+        return None
+
+
+async def handle_request(request: web.Request) -> web.StreamResponse:
+    replay: Replay = request.app["replay"]
+    path = request.path[len(API_PREFIX):]
+    if path in replay.capture.chunks:
+        return await handle_stream(request, path)
+    entry = replay.answer(path, dict(request.query))
+    if entry is None:
+        raise web.HTTPNotFound()
+    if request.app["latency"]:
+        await asyncio.sleep(entry["elapsed"] / replay.speed)
+    if "error" in entry and "status" not in entry:
+        # Timed out or dropped in the capture
+        replay.stats["dropped"] += 1
+        request.transport.close()
+        return web.Response(status=504)
+    return web.Response(
+        status=entry.get("status", 200),
+        body=_bytes(entry.get("body", "")),
+        content_type="application/json",
+    )
+
+
+async def handle_stream(request: web.Request, path: str) -> web.StreamResponse:
+    replay: Replay = request.app["replay"]
+    replay.stats["streams"] += 1
+    response = web.StreamResponse(headers={"Content-Type": "application/x-ndjson"})
+    await response.prepare(request)
+    now = replay.now()
+    try:
+        for entry in replay.capture.chunks[path]:
+            if entry["t"] < now:
+                continue
+            await replay.sleep_until(entry["t"])
+            await response.write(_bytes(entry["chunk"]))
+            replay.stats["chunks"] += 1
+        # End of the capture: hold the stream open like an idle controller
+        await asyncio.Event().wait()
+    except ConnectionResetError:
+        # The integration disconnected
+        pass
+    return response
+
+
+def create_app(
+    filename: str,
+    speed: float = 1.0,
+    start: float = 0.0,
+    sequential: bool = False,
+    latency: bool = True,
+) -> web.Application:
+    """Build the replay app for a capture file."""
+    capture = Capture(filename)
+    app = web.Application()
+    app["capture"] = capture
+    app["latency"] = latency
+
+    async def start_clock(app: web.Application):
+        app["replay"] = Replay(capture, speed, start, sequential)
+        yield
+
+    app.cleanup_ctx.append(start_clock)
+    app.router.add_get(API_PREFIX + "{path:.*}", handle_request)
+    return app
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("capture")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--speed", type=float, default=1.0, help="replay clock rate, e.g. 10 for 10x")
+    parser.add_argument("--start", type=float, default=0.0, help="seconds into the capture to start at")
+    parser.add_argument("--sequential", action="store_true", help="answer in recorded order per query")
+    parser.add_argument("--no-latency", action="store_true", help="answer without the recorded delay")
+    args = parser.parse_args()
+    if args.speed <= 0:
+        parser.error("--speed must be positive")
+
+    app = create_app(args.capture, args.speed, args.start, args.sequential, not args.no_latency)
+    capture: Capture = app["capture"]
+    print(
+        f"Replaying {sum(map(len, capture.by_path.values()))} requests and "
+        f"{sum(map(len, capture.chunks.values()))} stream chunks over {capture.duration:.0f}s "
+        f"of capture from {capture.header.get('host', '?')} at {args.speed:g}x"
+    )
+
+    async def print_stats(app: web.Application) -> None:
+        if "replay" in app:
+            print("Served:", dict(app["replay"].stats))
+
+    app.on_shutdown.append(print_stats)
+    web.run_app(app, port=args.port)
+
+
+if __name__ == "__main__":
+    main()